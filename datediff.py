@@ -1,5 +1,12 @@
 #!/usr/bin/env python3
 
+import operator
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque, namedtuple
+
 MIN_YEAR = 1901
 MAX_YEAR = 2999
 DEFAULT_DATE_FORMAT = "DD/MM/YYYY"
@@ -73,17 +80,7 @@ def parse(string, date_fmt):
     ...
     ValueError: cannot parse date: invalid literal for int() with base 10: 'CC'
     """
-    day_idx = date_fmt.find("DD")
-    month_idx = date_fmt.find("MM")
-    year_idx = date_fmt.find("YYYY")
-    try:
-        day = int(string[day_idx:day_idx+2])
-        month = int(string[month_idx:month_idx+2])
-        year = int(string[year_idx:year_idx+4])
-        validate(day, month, year)
-        return day, month, year
-    except ValueError as e:
-        raise ValueError("cannot parse date: " + str(e))
+    return compile_format(date_fmt).parse(string)
 
 doy_offset_comm = [sum(days_per_month_comm[:i]) for i in range(12)]
 doy_offset_leap = [sum(days_per_month_leap[:i]) for i in range(12)]
@@ -113,6 +110,402 @@ def days_since_epoch(day, month, year):
     doy = day_of_year(day, month, year)
     return doy + (year-1)*365 + (year-1)//4 - (year-1)//100 + (year-1)//400 - 1
 
+# The month of each day of the year, indexed by the day of the year minus one.
+month_of_doy_comm = [m + 1 for m, n in enumerate(days_per_month_comm) for _ in range(n)]
+month_of_doy_leap = [m + 1 for m, n in enumerate(days_per_month_leap) for _ in range(n)]
+
+def from_days_since_epoch(days):
+    """Return the day, month, and year tuple that is the given number of days
+    since the epoch. This is the inverse of days_since_epoch, and is calculated
+    in constant time.
+    >>> from_days_since_epoch(0)
+    (1, 1, 1)
+    >>> from_days_since_epoch(1154)
+    (29, 2, 4)
+    """
+    n400, days = divmod(days, 146097)
+    n100 = min(days // 36524, 3)
+    days -= n100*36524
+    n4, days = divmod(days, 1461)
+    n1 = min(days // 365, 3)
+    days -= n1*365
+    year = n400*400 + n100*100 + n4*4 + n1 + 1
+    if n1 == 3 and (n4 != 24 or n100 == 3):
+        month = month_of_doy_leap[days]
+        return days - doy_offset_leap[month-1] + 1, month, year
+    month = month_of_doy_comm[days]
+    return days - doy_offset_comm[month-1] + 1, month, year
+
+INVALID_DATE = 0xFFFFFFFF
+_TABLE_BASE = MIN_YEAR*372 + 32
+_days_table = None
+
+def days_table():
+    """Return a table mapping every day, month, and year triple between
+    MIN_YEAR and MAX_YEAR to its days_since_epoch, as an array of unsigned
+    integers indexed by (year-MIN_YEAR)*372 + (month-1)*31 + (day-1). Every
+    month occupies 31 entries; entries for days that do not exist hold
+    INVALID_DATE. The table is built on first use, after which
+    DateFormat.to_days replaces validate and days_since_epoch with a single
+    lookup.
+    >>> table = days_table()
+    >>> table[(2000-MIN_YEAR)*372 + (2-1)*31 + (29-1)]
+    730178
+    >>> table[(2001-MIN_YEAR)*372 + (2-1)*31 + (29-1)] == INVALID_DATE
+    True
+    """
+    global _days_table
+    if _days_table is None:
+        table = array("I")
+        padding = {n: array("I", [INVALID_DATE]) * (31-n) for n in range(28, 32)}
+        days = days_since_epoch(1, 1, MIN_YEAR)
+        for year in range(MIN_YEAR, MAX_YEAR+1):
+            if is_leap(year):
+                days_per_month = days_per_month_leap
+            else:
+                days_per_month = days_per_month_comm
+            for n in days_per_month:
+                table.extend(range(days, days+n))
+                table.extend(padding[n])
+                days += n
+        _days_table = table
+    return _days_table
+
+# The status of a date parsed by DateFormat.to_days_status.
+STATUS_OK = 0
+STATUS_INVALID_DAY = 1
+STATUS_INVALID_MONTH = 2
+STATUS_INVALID_YEAR = 3
+STATUS_UNPARSEABLE = 4
+STATUS_REASONS = ["ok", "invalid day", "invalid month", "invalid year", \
+        "unparseable"]
+
+class DateFormat:
+    """A date format that has been compiled by compile_format. The positions of
+    DD, MM, and YYYY are located once, so that parsing many dates of the same
+    format does not re-scan the format string for every date.
+    >>> fmt = compile_format("YYYY-MM-DD")
+    >>> fmt.parse("1989-01-03")
+    (3, 1, 1989)
+    >>> fmt.to_days("1989-01-03")
+    726104
+    """
+
+    def __init__(self, date_fmt):
+        if date_fmt.count("YYYY") != 1 or date_fmt.count("MM") != 1 or \
+                date_fmt.count("DD") != 1:
+            raise ValueError("date format must contain exactly one " \
+                    "occurrence of each DD, MM, and YYYY")
+        self.date_fmt = date_fmt
+        self.day_idx = date_fmt.find("DD")
+        self.month_idx = date_fmt.find("MM")
+        self.year_idx = date_fmt.find("YYYY")
+        template = []
+        end = 0
+        for idx, length, arg in sorted([(self.day_idx, 2, 0), \
+                (self.month_idx, 2, 1), (self.year_idx, 4, 2)]):
+            template.append(date_fmt[end:idx].replace("{", "{{").replace("}", "}}"))
+            template.append("{{{}:0{}}}".format(arg, length))
+            end = idx + length
+        template.append(date_fmt[end:].replace("{", "{{").replace("}", "}}"))
+        self._template = "".join(template)
+        self._width = max(self.day_idx + 2, self.month_idx + 2, self.year_idx + 4)
+
+    def __repr__(self):
+        return "compile_format({!r})".format(self.date_fmt)
+
+    def format(self, day, month, year):
+        """Return the given day, month, and year formatted in this format.
+        >>> compile_format("YYYY-MM-DD").format(3, 1, 1989)
+        '1989-01-03'
+        """
+        return self._template.format(day, month, year)
+
+    def parse(self, string):
+        """Parse a string as a date in this format, returning a day, month,
+        and year tuple. See parse.
+        """
+        day_idx = self.day_idx
+        month_idx = self.month_idx
+        year_idx = self.year_idx
+        try:
+            day = int(string[day_idx:day_idx+2])
+            month = int(string[month_idx:month_idx+2])
+            year = int(string[year_idx:year_idx+4])
+            validate(day, month, year)
+            return day, month, year
+        except ValueError as e:
+            raise ValueError("cannot parse date: " + str(e))
+
+    def to_days(self, string):
+        """Parse a string as a date in this format, returning the number of
+        days since the epoch. See days_since_epoch. If the parse cache is
+        enabled (see enable_parse_cache), the result is looked up there first.
+        """
+        if _parse_cache is not None:
+            return _parse_cache.to_days(self, string)
+        return self._to_days(string)
+
+    def _to_days(self, string):
+        table = _days_table
+        if table is None:
+            return days_since_epoch(*self.parse(string))
+        day_idx = self.day_idx
+        month_idx = self.month_idx
+        year_idx = self.year_idx
+        try:
+            day = int(string[day_idx:day_idx+2])
+            month = int(string[month_idx:month_idx+2])
+            year = int(string[year_idx:year_idx+4])
+            if 1 <= day <= 31 and 1 <= month <= 12 and \
+                    MIN_YEAR <= year <= MAX_YEAR:
+                days = table[year*372 + month*31 + day - _TABLE_BASE]
+                if days != INVALID_DATE:
+                    return days
+            validate(day, month, year)
+        except ValueError as e:
+            raise ValueError("cannot parse date: " + str(e))
+        raise AssertionError("days_table disagrees with validate")
+
+    def to_days_status(self, date):
+        """Parse a date (a string or bytes) in this format without raising,
+        returning the number of days since the epoch and a status: STATUS_OK,
+        or the reason the date is invalid, in which case the number of days is
+        0. Unlike parse, fields must consist of exactly their number of
+        digits; anything else is STATUS_UNPARSEABLE.
+        >>> fmt = compile_format("DD/MM/YYYY")
+        >>> fmt.to_days_status("03/01/1989")
+        (726104, 0)
+        >>> fmt.to_days_status("29/02/2100") == (0, STATUS_INVALID_DAY)
+        True
+        >>> fmt.to_days_status(b"3/1/1989") == (0, STATUS_UNPARSEABLE)
+        True
+        """
+        if len(date) < self._width:
+            return 0, STATUS_UNPARSEABLE
+        day_idx = self.day_idx
+        month_idx = self.month_idx
+        year_idx = self.year_idx
+        if isinstance(date, str):
+            day = date[day_idx:day_idx+2]
+            month = date[month_idx:month_idx+2]
+            year = date[year_idx:year_idx+4]
+            fields = day + month + year
+            # Only ASCII digits, as in the bytes and NumPy paths.
+            if not (fields.isascii() and fields.isdecimal()):
+                return 0, STATUS_UNPARSEABLE
+            day = int(day)
+            month = int(month)
+            year = int(year)
+        else:
+            digits = _digit_values
+            day = digits[date[day_idx]]*10 + digits[date[day_idx+1]]
+            month = digits[date[month_idx]]*10 + digits[date[month_idx+1]]
+            year = digits[date[year_idx]]*1000 + digits[date[year_idx+1]]*100 + \
+                    digits[date[year_idx+2]]*10 + digits[date[year_idx+3]]
+            if day < 0 or month < 0 or year < 0:
+                return 0, STATUS_UNPARSEABLE
+        if not MIN_YEAR <= year <= MAX_YEAR:
+            return 0, STATUS_INVALID_YEAR
+        if not 1 <= month <= 12:
+            return 0, STATUS_INVALID_MONTH
+        if 1 <= day <= 31:
+            days = (_days_table or days_table())[year*372 + month*31 + day - \
+                    _TABLE_BASE]
+            if days != INVALID_DATE:
+                return days, STATUS_OK
+        return 0, STATUS_INVALID_DAY
+
+    def to_days_bytes(self, data, start=0):
+        """Parse the date starting at offset start of data, which may be bytes,
+        a bytearray, a memoryview, or an mmap, returning the number of days
+        since the epoch. Digits are decoded directly from their ASCII codes,
+        so no strings or intermediate objects are created. Dates that are not
+        plain digits at this format's offsets are handed to to_days, so that
+        they are accepted or rejected exactly as they would be by datediff.
+        >>> compile_format("YYYY-MM-DD").to_days_bytes(b"1989-01-03")
+        726104
+        >>> compile_format("YYYY-MM-DD").to_days_bytes(b"id=7 1989-01-03", 5)
+        726104
+        """
+        digits = _digit_values
+        day_idx = start + self.day_idx
+        month_idx = start + self.month_idx
+        year_idx = start + self.year_idx
+        try:
+            day = digits[data[day_idx]]*10 + digits[data[day_idx+1]]
+            month = digits[data[month_idx]]*10 + digits[data[month_idx+1]]
+            year = digits[data[year_idx]]*1000 + digits[data[year_idx+1]]*100 + \
+                    digits[data[year_idx+2]]*10 + digits[data[year_idx+3]]
+        except IndexError:
+            day = 0
+        if 1 <= day <= 31 and 1 <= month <= 12 and MIN_YEAR <= year <= MAX_YEAR:
+            days = (_days_table or days_table())[year*372 + month*31 + day - \
+                    _TABLE_BASE]
+            if days != INVALID_DATE:
+                return days
+        return self.to_days(bytes(data[start:start+len(self.date_fmt)]))
+
+CacheInfo = namedtuple("CacheInfo", "hits misses evictions maxsize currsize")
+
+class _ParseCache:
+    """A least recently used cache of DateFormat.to_days results, keyed on the
+    string and the date format. Only dates that parse successfully are cached.
+    DateFormat.to_days_bytes is already cheaper than a lookup, so it does not
+    use the cache.
+    """
+
+    def __init__(self, maxsize):
+        import threading
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def to_days(self, date_fmt, string):
+        key = string, date_fmt.date_fmt
+        days = self.entries.get(key)
+        if days is not None:
+            # Hits are not locked, so that they stay cheap; the entry may be
+            # evicted by another thread before it is moved, and concurrent
+            # increments of the hit counter may be lost.
+            self.hits += 1
+            try:
+                self.entries.move_to_end(key)
+            except KeyError:
+                pass
+            return days
+        days = date_fmt._to_days(string)
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = days
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return days
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, \
+                len(self.entries))
+
+_parse_cache = None
+
+def enable_parse_cache(maxsize=4096):
+    """Cache the number of days since the epoch for up to maxsize of the most
+    recently parsed dates, so that inputs that repeat the same dates are only
+    parsed and validated once. Enabling the cache again replaces it with an
+    empty cache of the new size.
+    >>> enable_parse_cache(2)
+    >>> datediff("03/01/1989", "03/08/1983"), datediff("03/01/1989", "04/08/1983")
+    (1979, 1978)
+    >>> parse_cache_info()
+    CacheInfo(hits=1, misses=3, evictions=1, maxsize=2, currsize=2)
+    >>> disable_parse_cache()
+    """
+    global _parse_cache
+    if maxsize < 1:
+        raise ValueError("maxsize must be at least 1")
+    _parse_cache = _ParseCache(maxsize)
+
+def disable_parse_cache():
+    """Stop caching parsed dates and discard the cache."""
+    global _parse_cache
+    _parse_cache = None
+
+def clear_parse_cache():
+    """Discard every cached date and reset the cache statistics."""
+    if _parse_cache is not None:
+        enable_parse_cache(_parse_cache.maxsize)
+
+def parse_cache_info():
+    """Return the number of hits, misses, and evictions of the parse cache,
+    with its maximum and current number of entries, as a CacheInfo. Every
+    value is zero if the cache is disabled. Hits are counted without a lock so
+    that they stay cheap, so when several threads share the cache (as in the
+    server) the number of hits is approximate; the other values are exact.
+    """
+    if _parse_cache is None:
+        return CacheInfo(0, 0, 0, 0, 0)
+    return _parse_cache.info()
+
+# The value of each ASCII digit, indexed by character code. Any other character
+# is given a value negative enough that a field containing it is out of range.
+_digit_values = tuple(c - 48 if 48 <= c <= 57 else -10000 for c in range(256))
+
+_format_cache = {}
+_MAX_FORMAT_CACHE = 64
+
+def compile_format(date_fmt):
+    """Compile date_fmt into a DateFormat, analogous to re.compile. Compiled
+    formats are cached, so calling this function repeatedly with the same
+    string is cheap. Passing an already compiled DateFormat returns it as is.
+    >>> compile_format("DD/MM/YYYY")
+    compile_format('DD/MM/YYYY')
+    >>> compile_format("DD/MM/YY")
+    Traceback (most recent call last):
+    ...
+    ValueError: date format must contain exactly one occurrence of each DD, MM, and YYYY
+    """
+    if isinstance(date_fmt, DateFormat):
+        return date_fmt
+    try:
+        return _format_cache[date_fmt]
+    except KeyError:
+        pass
+    fmt = DateFormat(date_fmt)
+    if len(_format_cache) >= _MAX_FORMAT_CACHE:
+        _format_cache.clear()
+    _format_cache[date_fmt] = fmt
+    return fmt
+
+DETECT_FORMATS = ["DD/MM/YYYY", "YYYY-MM-DD", "MM/DD/YYYY"]
+
+def _matches(date_fmt, string):
+    """Return True if string is a valid date in the compiled format date_fmt,
+    including the characters between its fields.
+    """
+    fmt = date_fmt.date_fmt
+    if len(string) < len(fmt):
+        return False
+    fields = set()
+    for idx, length in [(date_fmt.day_idx, 2), (date_fmt.month_idx, 2), \
+            (date_fmt.year_idx, 4)]:
+        fields.update(range(idx, idx + length))
+    for i, c in enumerate(fmt):
+        if i not in fields and string[i] != c:
+            return False
+    try:
+        date_fmt.parse(string)
+    except ValueError:
+        return False
+    return True
+
+def detect_format(samples, candidates=DETECT_FORMATS):
+    """Return the only one of the candidate formats that every one of the
+    sample dates (strings or bytes) is valid in. Raise a ValueError if no
+    candidate, or more than one, fits the samples.
+    >>> detect_format(["03/01/1989", "22/06/1983"])
+    'DD/MM/YYYY'
+    >>> detect_format(["1989-01-03"])
+    'YYYY-MM-DD'
+    >>> detect_format(["03/01/1989", "03/08/1983"])
+    Traceback (most recent call last):
+    ...
+    ValueError: ambiguous date format: DD/MM/YYYY or MM/DD/YYYY
+    """
+    samples = [s.decode("ascii", "replace") if isinstance(s, bytes) else s \
+            for s in samples]
+    if not samples:
+        raise ValueError("cannot detect date format: no samples")
+    matches = [fmt for fmt in candidates if all(_matches(compile_format(fmt), s) \
+            for s in samples)]
+    if not matches:
+        raise ValueError("cannot detect date format: no candidate matches " \
+                "every sample")
+    if len(matches) > 1:
+        raise ValueError("ambiguous date format: " + " or ".join(matches))
+    return matches[0]
+
 def datediff(date1, date2, date_fmt=DEFAULT_DATE_FORMAT):
     """Return the number of whole days between two dates. The order of dates
     does not matter. Dates should be formatted according to date_fmt.
@@ -131,36 +524,1302 @@ def datediff(date1, date2, date_fmt=DEFAULT_DATE_FORMAT):
     >>> datediff("1989-01-03", "1983-08-03", "YYYY-MM-DD")
     1979
     """
-    date1 = parse(date1, date_fmt)
-    date2 = parse(date2, date_fmt)
-    days = days_since_epoch(*date1) - days_since_epoch(*date2)
+    date_fmt = compile_format(date_fmt)
+    days = date_fmt.to_days(date1) - date_fmt.to_days(date2)
     if days != 0:
         days = abs(days) - 1
     return days
 
-if __name__ == "__main__":
+def add_days(date, days, date_fmt=DEFAULT_DATE_FORMAT):
+    """Return the date that is the given number of days after date (or before
+    it, if days is negative), formatted according to date_fmt like date.
+    >>> add_days("28/02/2000", 1)
+    '29/02/2000'
+    >>> add_days("1989-01-03", -1980, "YYYY-MM-DD")
+    '1983-08-03'
+    >>> add_days("31/12/2999", 1)
+    Traceback (most recent call last):
+    ...
+    ValueError: cannot add days: invalid year
+    """
+    date_fmt = compile_format(date_fmt)
+    day, month, year = from_days_since_epoch(date_fmt.to_days(date) + days)
+    try:
+        validate(day, month, year)
+    except ValueError as e:
+        raise ValueError("cannot add days: " + str(e))
+    return date_fmt.format(day, month, year)
+
+MIN_DAYS = days_since_epoch(1, 1, MIN_YEAR)
+MAX_DAYS = days_since_epoch(31, 12, MAX_YEAR)
+UNIX_EPOCH_DAYS = days_since_epoch(1, 1, 1970)
+
+class Date:
+    """A date between MIN_YEAR and MAX_YEAR, stored only as its number of days
+    since the epoch. The day, month, and year are derived when they are
+    accessed. Subtracting two dates returns the number of whole days between
+    them, like datediff, and dates are hashable and ordered.
+    >>> a = Date.parse("03/01/1989")
+    >>> b = Date.parse("1983-08-03", "YYYY-MM-DD")
+    >>> a - b
+    1979
+    >>> b < a, a.day, a.month, a.year
+    (True, 3, 1, 1989)
+    >>> a
+    Date(726104)
+    >>> print(a)
+    03/01/1989
+    """
+
+    __slots__ = ("days",)
+
+    def __init__(self, days):
+        days = operator.index(days)
+        if not MIN_DAYS <= days <= MAX_DAYS:
+            raise ValueError("invalid date")
+        self.days = days
+
+    @classmethod
+    def parse(cls, string, date_fmt=DEFAULT_DATE_FORMAT):
+        """Parse a string formatted according to date_fmt as a Date."""
+        return cls(compile_format(date_fmt).to_days(string))
+
+    @property
+    def day(self):
+        return from_days_since_epoch(self.days)[0]
+
+    @property
+    def month(self):
+        return from_days_since_epoch(self.days)[1]
+
+    @property
+    def year(self):
+        return from_days_since_epoch(self.days)[2]
+
+    def __repr__(self):
+        return "Date({})".format(self.days)
+
+    def __str__(self):
+        return self.format()
+
+    def format(self, date_fmt=DEFAULT_DATE_FORMAT):
+        """Return this date formatted according to date_fmt."""
+        return compile_format(date_fmt).format(*from_days_since_epoch(self.days))
+
+    def __sub__(self, other):
+        if not isinstance(other, Date):
+            return NotImplemented
+        days = self.days - other.days
+        if days != 0:
+            days = abs(days) - 1
+        return days
+
+    def __hash__(self):
+        return hash(self.days)
+
+    def __eq__(self, other):
+        if not isinstance(other, Date):
+            return NotImplemented
+        return self.days == other.days
+
+    def __lt__(self, other):
+        if not isinstance(other, Date):
+            return NotImplemented
+        return self.days < other.days
+
+    def __le__(self, other):
+        if not isinstance(other, Date):
+            return NotImplemented
+        return self.days <= other.days
+
+    def __gt__(self, other):
+        if not isinstance(other, Date):
+            return NotImplemented
+        return self.days > other.days
+
+    def __ge__(self, other):
+        if not isinstance(other, Date):
+            return NotImplemented
+        return self.days >= other.days
+
+class DateIndex:
+    """A sorted index of dates, stored compactly as their numbers of days since
+    the epoch, that answers range and nearest-date queries by binary search.
+    Queries accept dates formatted according to the index's date_fmt, or Date
+    objects, and return Date objects.
+    >>> index = DateIndex(["03/01/1989", "03/08/1983", "22/06/1983", "04/08/1983"])
+    >>> index.count_between("01/06/1983", "31/12/1983")
+    3
+    >>> print(index.nearest("01/01/1985"))
+    04/08/1983
+    >>> [str(d) for d in index.within("05/08/1983", 1)]
+    ['03/08/1983', '04/08/1983']
+    """
+
+    def __init__(self, dates, date_fmt=DEFAULT_DATE_FORMAT):
+        self.date_fmt = compile_format(date_fmt)
+        np = sys.modules.get("numpy")
+        if np is not None and isinstance(dates, np.ndarray):
+            days = _days_since_epoch_numpy(np, dates, self.date_fmt)
+            self.days = array("i", np.sort(days).astype(np.int32).tobytes())
+        else:
+            days_table()
+            self.days = array("i", sorted(map(self.date_fmt.to_days, dates)))
+
+    def __len__(self):
+        return len(self.days)
+
+    def _to_days(self, date):
+        if isinstance(date, Date):
+            return date.days
+        return self.date_fmt.to_days(date)
+
+    def count_between(self, date1, date2):
+        """Return the number of dates in the index between date1 and date2,
+        inclusive. The order of the dates does not matter.
+        """
+        days1 = self._to_days(date1)
+        days2 = self._to_days(date2)
+        if days1 > days2:
+            days1, days2 = days2, days1
+        return bisect_right(self.days, days2) - bisect_left(self.days, days1)
+
+    def nearest(self, date):
+        """Return the date in the index nearest to date, preferring the
+        earlier date if two are equally near, or None if the index is empty.
+        """
+        days = self._to_days(date)
+        i = bisect_left(self.days, days)
+        candidates = self.days[max(i-1, 0):i+1]
+        if not candidates:
+            return None
+        return Date(min(candidates, key=lambda n: abs(n - days)))
+
+    def within(self, date, whole_days):
+        """Return the dates in the index, in order, with at most whole_days
+        whole days between them and date (see datediff).
+        """
+        if whole_days < 0:
+            raise ValueError("whole_days must not be negative")
+        days = self._to_days(date)
+        lo = bisect_left(self.days, days - whole_days - 1)
+        hi = bisect_right(self.days, days + whole_days + 1)
+        return [Date(n) for n in self.days[lo:hi]]
+
+def weekday(days):
+    """Return the day of the week of the date that is the given number of days
+    since the epoch, where Monday is 0 and Sunday is 6. The epoch, 01/01/0001,
+    was a Monday.
+    >>> weekday(days_since_epoch(3, 1, 1989))
+    1
+    """
+    return days % 7
+
+def _weekdays_before(days):
+    """Return the number of weekdays (Monday to Friday) from the epoch up to,
+    but not including, the date that is the given number of days since it.
+    """
+    return days // 7 * 5 + min(days % 7, 5)
+
+class HolidayCalendar:
+    """A set of holidays, stored as a prefix sum over every date between
+    MIN_YEAR and MAX_YEAR of the number of holidays that fall on weekdays, so
+    that the number of holidays between any two dates is found in constant
+    time. Build a calendar once and pass it to every call of
+    business_days_between.
+    """
+
+    def __init__(self, holidays=(), date_fmt=DEFAULT_DATE_FORMAT):
+        from itertools import accumulate
+        date_fmt = compile_format(date_fmt)
+        bitmap = bytearray(MAX_DAYS - MIN_DAYS + 1)
+        for holiday in holidays:
+            days = date_fmt.to_days(holiday)
+            if weekday(days) < 5:
+                bitmap[days - MIN_DAYS] = 1
+        self.prefix = array("i", [0])
+        self.prefix.extend(accumulate(bitmap))
 
-    import doctest
-    doctest.testmod()
+    def count_before(self, days):
+        """Return the number of weekday holidays before the date that is the
+        given number of days since the epoch.
+        """
+        return self.prefix[days - MIN_DAYS]
+
+def business_days_between(date1, date2, date_fmt=DEFAULT_DATE_FORMAT, \
+        holidays=None):
+    """Return the number of whole business days between two dates, that is, the
+    weekdays strictly between them that are not holidays. The order of dates
+    does not matter. holidays, if given, must be a HolidayCalendar, which is
+    built once so that each call takes constant time.
+    >>> business_days_between("06/01/1989", "09/01/1989")
+    0
+    >>> business_days_between("02/01/1989", "09/01/1989")
+    4
+    >>> calendar = HolidayCalendar(["03/01/1989"])
+    >>> business_days_between("02/01/1989", "09/01/1989", holidays=calendar)
+    3
+    """
+    if holidays is not None and not isinstance(holidays, HolidayCalendar):
+        raise TypeError("holidays must be a HolidayCalendar")
+    date_fmt = compile_format(date_fmt)
+    days1 = date_fmt.to_days(date1)
+    days2 = date_fmt.to_days(date2)
+    if days1 > days2:
+        days1, days2 = days2, days1
+    if days2 - days1 < 2:
+        return 0
+    result = _weekdays_before(days2) - _weekdays_before(days1 + 1)
+    if holidays is not None:
+        result -= holidays.count_before(days2) - holidays.count_before(days1 + 1)
+    return result
+
+def datediff_many(dates1, dates2, date_fmt=DEFAULT_DATE_FORMAT):
+    """Return the number of whole days between each pair of dates taken from
+    dates1 and dates2, as an array of 32-bit integers. This is equivalent to
+    calling datediff on every pair. If either argument is a NumPy array of
+    strings or bytes, the calculation is vectorized over the whole array and a
+    NumPy int32 array is returned; otherwise an array.array of type 'i' is
+    returned. NumPy datetime64 arrays are also accepted, and are used without
+    being formatted as strings (date_fmt is ignored for them).
+    >>> datediff_many(["02/06/1983", "03/01/1989"], ["22/06/1983", "03/08/1983"])
+    array('i', [19, 1979])
+    >>> datediff_many(["03/08/2018"], [])
+    Traceback (most recent call last):
+    ...
+    ValueError: dates1 and dates2 must have the same length
+    """
+    if len(dates1) != len(dates2):
+        raise ValueError("dates1 and dates2 must have the same length")
+    date_fmt = compile_format(date_fmt)
+    np = sys.modules.get("numpy")
+    if np is not None and (isinstance(dates1, np.ndarray) or \
+            isinstance(dates2, np.ndarray)):
+        days = _days_since_epoch_numpy(np, dates1, date_fmt) - \
+                _days_since_epoch_numpy(np, dates2, date_fmt)
+        days = np.abs(days)
+        days = np.where(days != 0, days - 1, 0).astype(np.int32)
+        return days.reshape(np.shape(dates1))
+    days_table()
+    to_days = date_fmt.to_days
+    result = array("i")
+    for date1, date2 in zip(dates1, dates2):
+        days = to_days(date1) - to_days(date2)
+        if days != 0:
+            days = abs(days) - 1
+        result.append(days)
+    return result
+
+def datediff_matrix(dates, date_fmt=DEFAULT_DATE_FORMAT, condensed=False):
+    """Return the number of whole days between every pair of the given dates,
+    each of which is parsed only once. The result is a matrix whose element
+    [i][j] is datediff(dates[i], dates[j]) or, if condensed is True, only the
+    elements above its diagonal in row-major order (the layout used by
+    scipy.spatial.distance.pdist). If dates is a NumPy array of strings or
+    bytes, the matrix is calculated by broadcasting and returned as a NumPy
+    int32 array; otherwise it is returned as a list of rows, each an
+    array.array of type 'i', or as a single such array if condensed.
+    >>> datediff_matrix(["02/06/1983", "22/06/1983", "03/01/1989"])
+    [array('i', [0, 19, 2041]), array('i', [19, 0, 2021]), array('i', [2041, 2021, 0])]
+    >>> datediff_matrix(["02/06/1983", "22/06/1983", "03/01/1989"], condensed=True)
+    array('i', [19, 2041, 2021])
+    """
+    date_fmt = compile_format(date_fmt)
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(dates, np.ndarray):
+        days = _days_since_epoch_numpy(np, dates, date_fmt).astype(np.int32)
+        if condensed:
+            i, j = np.triu_indices(len(days), 1)
+            days = np.abs(days[i] - days[j])
+        else:
+            days = np.abs(days[:, np.newaxis] - days[np.newaxis, :])
+        return np.maximum(days - 1, 0, out=days)
+    days_table()
+    days = [date_fmt.to_days(date) for date in dates]
+    if condensed:
+        result = array("i")
+        for i, a in enumerate(days):
+            result.extend(max(abs(a - b) - 1, 0) for b in days[i+1:])
+        return result
+    return [array("i", [max(abs(a - b) - 1, 0) for b in days]) for a in days]
+
+def datediff_from(reference, dates, date_fmt=DEFAULT_DATE_FORMAT):
+    """Return the number of whole days between reference and each of the given
+    dates, parsing reference only once. If dates is a NumPy array of strings
+    or bytes, the calculation is vectorized and a NumPy int32 array is
+    returned; otherwise dates may be any iterable, and an array.array of type
+    'i' is returned.
+    >>> datediff_from("03/08/1983", ["22/06/1983", "03/01/1989", "04/08/1983"])
+    array('i', [41, 1979, 0])
+    """
+    date_fmt = compile_format(date_fmt)
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(dates, np.ndarray):
+        days = np.abs(_days_since_epoch_numpy(np, dates, date_fmt) - \
+                date_fmt.to_days(reference))
+        return np.maximum(days - 1, 0).astype(np.int32)
+    return array("i", _iter_datediff_from(date_fmt.to_days(reference), dates, \
+            date_fmt))
+
+def _iter_datediff_from(reference, dates, date_fmt):
+    """Yield the number of whole days between reference, a number of days
+    since the epoch, and each of the given dates (strings or bytes) in the
+    compiled format date_fmt.
+    """
+    days_table()
+    to_days = date_fmt.to_days
+    to_days_bytes = date_fmt.to_days_bytes
+    for lineno, date in enumerate(dates, 1):
+        try:
+            if isinstance(date, bytes):
+                days = to_days_bytes(date) - reference
+            else:
+                days = to_days(date) - reference
+        except ValueError as e:
+            raise ValueError("line {}: {}".format(lineno, e))
+        if days != 0:
+            days = abs(days) - 1
+        yield days
+
+def datediff_many_status(dates1, dates2, date_fmt=DEFAULT_DATE_FORMAT):
+    """Return the number of whole days between each pair of dates taken from
+    dates1 and dates2, like datediff_many, together with the status of each
+    pair, without raising an exception for invalid dates. The status of a pair
+    is that of its first invalid date (see DateFormat.to_days_status), or
+    STATUS_OK, and the number of days for an invalid pair is 0. If either
+    argument is a NumPy array, NumPy int32 and uint8 arrays are returned;
+    otherwise array.array objects of type 'i' and 'B' are returned.
+    >>> datediff_many_status(["02/06/1983", "29/02/2100"], ["22/06/1983", "01/01/2000"])
+    (array('i', [19, 0]), array('B', [0, 1]))
+    """
+    if len(dates1) != len(dates2):
+        raise ValueError("dates1 and dates2 must have the same length")
+    date_fmt = compile_format(date_fmt)
+    np = sys.modules.get("numpy")
+    if np is not None and (isinstance(dates1, np.ndarray) or \
+            isinstance(dates2, np.ndarray)):
+        days1, status1 = _days_since_epoch_numpy(np, dates1, date_fmt, True)
+        days2, status2 = _days_since_epoch_numpy(np, dates2, date_fmt, True)
+        status = np.where(status1 != STATUS_OK, status1, status2)
+        days = np.abs(days1 - days2)
+        days = np.where((days != 0) & (status == STATUS_OK), days - 1, 0)
+        return days.astype(np.int32).reshape(np.shape(dates1)), \
+                status.reshape(np.shape(dates1))
+    days_table()
+    to_days_status = date_fmt.to_days_status
+    result = array("i")
+    statuses = array("B")
+    for date1, date2 in zip(dates1, dates2):
+        days1, status = to_days_status(date1)
+        days2, status2 = to_days_status(date2)
+        if status == STATUS_OK:
+            status = status2
+        days = days1 - days2
+        if days != 0 and status == STATUS_OK:
+            days = abs(days) - 1
+        else:
+            days = 0
+        result.append(days)
+        statuses.append(status)
+    return result, statuses
+
+def _days_since_epoch_numpy(np, dates, date_fmt, status=False):
+    """Vectorized equivalent of date_fmt.to_days(date) for every date in a
+    NumPy array of strings, bytes, or datetime64 values, returning an int64
+    array. Digits are decoded directly from the array's character codes;
+    elements that are not plain digits at the format's offsets are handed to
+    date_fmt.parse so that they are accepted or rejected exactly as they would
+    be by datediff.
+
+    If status is True, nothing is raised. Instead, a uint8 array holding the
+    status of each date (see DateFormat.to_days_status) is also returned, and
+    invalid dates are given 0 days.
+    """
+    dates = np.ascontiguousarray(np.asarray(dates).reshape(-1))
+    if dates.dtype.kind == "O":
+        # Object arrays (such as those returned by pandas) are rebuilt so that
+        # NumPy infers a string or bytes dtype from their elements.
+        dates = np.array(dates.tolist()) if len(dates) else dates.astype("U")
+    if dates.dtype.kind == "M":
+        return _days_since_epoch_datetime64(np, dates, status)
+    if dates.dtype.kind == "S":
+        width = dates.dtype.itemsize
+        codes = dates.view(np.uint8)
+    elif dates.dtype.kind == "U":
+        width = dates.dtype.itemsize // 4
+        codes = dates.view(np.uint32)
+    else:
+        raise TypeError("dates must be an array of strings or bytes")
+    codes = codes.reshape(len(dates), width)
+
+    def field(idx, length):
+        value = np.zeros(len(dates), dtype=np.int64)
+        digits = np.ones(len(dates), dtype=bool)
+        if idx < 0 or idx + length > width:
+            digits[:] = False
+            return value, digits
+        for i in range(idx, idx + length):
+            digit = codes[:, i].astype(np.int64) - 48
+            digits &= (digit >= 0) & (digit <= 9)
+            value = value*10 + digit
+        return value, digits
+
+    day, day_ok = field(date_fmt.day_idx, 2)
+    month, month_ok = field(date_fmt.month_idx, 2)
+    year, year_ok = field(date_fmt.year_idx, 4)
+    digits = day_ok & month_ok & year_ok
+    if not status:
+        for i in np.flatnonzero(~digits):
+            day[i], month[i], year[i] = date_fmt.parse(dates[i])
+
+    table = np.frombuffer(days_table(), dtype=np.uint32)
+    year_ok = (year >= MIN_YEAR) & (year <= MAX_YEAR)
+    month_ok = (month >= 1) & (month <= 12)
+    in_range = year_ok & month_ok & (day >= 1) & (day <= 31)
+    days = table[np.where(in_range, year*372 + month*31 + day - _TABLE_BASE, 0)]
+    valid = in_range & (days != INVALID_DATE)
+    if status:
+        valid &= digits
+        codes = np.select([~digits, ~year_ok, ~month_ok, ~valid], \
+                [STATUS_UNPARSEABLE, STATUS_INVALID_YEAR, STATUS_INVALID_MONTH, \
+                STATUS_INVALID_DAY], STATUS_OK).astype(np.uint8)
+        return np.where(valid, days, 0).astype(np.int64), codes
+    if not valid.all():
+        # parse raises the same error datediff would for this element
+        date_fmt.parse(dates[np.argmin(valid)])
+    return days.astype(np.int64)
+
+def _days_since_epoch_datetime64(np, dates, status=False):
+    """The part of _days_since_epoch_numpy for arrays of datetime64 values,
+    which only need their epoch shifted and their range checked. NaT is
+    unparseable.
+    """
+    nat = np.isnat(dates)
+    days = dates.astype("datetime64[D]").view(np.int64) + UNIX_EPOCH_DAYS
+    valid = ~nat & (days >= MIN_DAYS) & (days <= MAX_DAYS)
+    if status:
+        codes = np.select([nat, ~valid], [STATUS_UNPARSEABLE, \
+                STATUS_INVALID_YEAR], STATUS_OK).astype(np.uint8)
+        return np.where(valid, days, 0), codes
+    if not valid.all():
+        if nat.any():
+            raise ValueError("cannot parse date: NaT")
+        raise ValueError("cannot parse date: invalid year")
+    return days
+
+# Other day numbering systems, as the number of days since the epoch of their
+# day 0, the number of their units per day, and the number of units from the
+# midnight that starts a day to their start of that day. Excel's 1900 date
+# system counts 29/02/1900 as a day, so its day 0 is effectively 30/12/1899 for
+# every date after February 1900. Julian days start at noon.
+DAY_NUMBER_SYSTEMS = {
+    "unix": (UNIX_EPOCH_DAYS, 1, 0),
+    "unix_seconds": (UNIX_EPOCH_DAYS, 86400, 0),
+    "excel": (days_since_epoch(30, 12, 1899), 1, 0),
+    "julian": (-1721426, 1, 0.5),
+}
+
+def _day_number_system(system):
+    try:
+        return DAY_NUMBER_SYSTEMS[system]
+    except KeyError:
+        raise ValueError("unknown day number system: {!r}".format(system))
+
+def from_day_number(value, system):
+    """Convert a Unix timestamp in days ("unix") or seconds ("unix_seconds"),
+    an Excel 1900 date system serial number ("excel"), or a Julian Day Number
+    ("julian") to the number of days since the epoch. Fractions of a day give
+    the day on which that moment falls; for Julian Dates, which start at noon,
+    2447529.5 is midnight at the start of 03/01/1989. The date must lie between
+    MIN_YEAR and MAX_YEAR.
+    >>> from_days_since_epoch(from_day_number(600000000, "unix_seconds"))
+    (5, 1, 1989)
+    >>> from_days_since_epoch(from_day_number(32511.75, "excel"))
+    (3, 1, 1989)
+    >>> from_days_since_epoch(from_day_number(2447530, "julian"))
+    (3, 1, 1989)
+    >>> from_days_since_epoch(from_day_number(2447529.25, "julian"))
+    (2, 1, 1989)
+    """
+    offset, scale, start = _day_number_system(system)
+    days = int((value + start) // scale) + offset
+    if not MIN_DAYS <= days <= MAX_DAYS:
+        raise ValueError("invalid year")
+    return days
+
+def to_day_number(days, system):
+    """Convert a number of days since the epoch to the day number system
+    named by system (see from_day_number). For "unix_seconds", the result is
+    the timestamp of the start of the day; for "julian", it is the Julian Day
+    Number, which starts at noon of the day.
+    >>> to_day_number(days_since_epoch(3, 1, 1989), "excel")
+    32511
+    """
+    offset, scale, start = _day_number_system(system)
+    if not MIN_DAYS <= days <= MAX_DAYS:
+        raise ValueError("invalid year")
+    return (days - offset) * scale
+
+def from_day_number_many(values, system):
+    """Vectorized equivalent of from_day_number. If values is a NumPy array, a
+    NumPy int32 array is returned; otherwise an array.array of type 'i' is
+    returned.
+    >>> from_day_number_many([0, 1], "unix")
+    array('i', [719162, 719163])
+    """
+    offset, scale, start = _day_number_system(system)
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(values, np.ndarray):
+        if start:
+            values = values + start
+        days = np.floor_divide(values, scale).astype(np.int64) + offset
+        if not ((days >= MIN_DAYS) & (days <= MAX_DAYS)).all():
+            raise ValueError("invalid year")
+        return days.astype(np.int32)
+    return array("i", [from_day_number(value, system) for value in values])
+
+def to_day_number_many(days, system):
+    """Vectorized equivalent of to_day_number. If days is a NumPy array, a
+    NumPy int64 array is returned; otherwise an array.array of type 'q' is
+    returned.
+    >>> to_day_number_many([719162, 719163], "unix_seconds")
+    array('q', [0, 86400])
+    """
+    offset, scale, start = _day_number_system(system)
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(days, np.ndarray):
+        days = days.astype(np.int64)
+        if not ((days >= MIN_DAYS) & (days <= MAX_DAYS)).all():
+            raise ValueError("invalid year")
+        return (days - offset) * scale
+    return array("q", [to_day_number(n, system) for n in days])
+
+def days_to_datetime64(days):
+    """Convert numbers of days since the epoch to a NumPy datetime64[D] array,
+    by shifting them to the Unix epoch used by NumPy.
+    """
+    import numpy as np
+    return (np.asarray(days, dtype=np.int64) - UNIX_EPOCH_DAYS).view("datetime64[D]")
+
+def datetime64_to_days(dates):
+    """Convert NumPy datetime64 values to an int64 array of numbers of days
+    since the epoch, by shifting them from the Unix epoch used by NumPy. Values
+    with a finer unit than days are truncated to their date. Like datediff,
+    this raises ValueError for NaT and for dates outside MIN_YEAR to MAX_YEAR.
+    """
+    import numpy as np
+    dates = np.asarray(dates)
+    if dates.dtype.kind != "M":
+        dates = dates.astype("datetime64[D]")
+    return _days_since_epoch_datetime64(np, dates)
+
+def from_days_since_epoch_many(days):
+    """Return the days, months, and years that are each of the given numbers
+    of days since the epoch, as three arrays. This is the vectorized
+    equivalent of from_days_since_epoch. If days is a NumPy array, NumPy int32
+    arrays are returned; otherwise array.array objects of type 'i' are
+    returned.
+    >>> from_days_since_epoch_many([0, 1154])
+    (array('i', [1, 29]), array('i', [1, 2]), array('i', [1, 4]))
+    """
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(days, np.ndarray):
+        days = days.astype(np.int64)
+        n400, days = np.divmod(days, 146097)
+        n100 = np.minimum(days // 36524, 3)
+        days = days - n100*36524
+        n4, days = np.divmod(days, 1461)
+        n1 = np.minimum(days // 365, 3)
+        days = days - n1*365
+        year = n400*400 + n100*100 + n4*4 + n1 + 1
+        leap = (n1 == 3) & ((n4 != 24) | (n100 == 3))
+        month = np.where(leap, np.array(month_of_doy_leap)[np.minimum(days, 365)], \
+                np.array(month_of_doy_comm)[np.minimum(days, 364)])
+        day = days + 1 - np.where(leap, np.array(doy_offset_leap)[month-1], \
+                np.array(doy_offset_comm)[month-1])
+        return day.astype(np.int32), month.astype(np.int32), year.astype(np.int32)
+    result = array("i"), array("i"), array("i")
+    for n in days:
+        for values, value in zip(result, from_days_since_epoch(n)):
+            values.append(value)
+    return result
+
+def datediff_lines(lines, date_fmt=DEFAULT_DATE_FORMAT, delimiter=None):
+    """Return the number of whole days between the two dates on each of the
+    given lines, yielding one result per line. The dates on a line are
+    separated by delimiter, or by any whitespace if delimiter is None. Lines
+    are consumed lazily, so this can be used on arbitrarily large files. Lines
+    may be bytes (with a bytes delimiter), in which case they are never
+    decoded.
+    >>> list(datediff_lines(["02/06/1983 22/06/1983", "03/01/1989 03/08/1983"]))
+    [19, 1979]
+    >>> list(datediff_lines(["1989-01-03,1983-08-03"], "YYYY-MM-DD", ","))
+    [1979]
+    >>> list(datediff_lines([b"1989-01-03,1983-08-03"], "YYYY-MM-DD", b","))
+    [1979]
+    >>> list(datediff_lines(["02/06/1983 22/06/1983", "03/01/1989"]))
+    Traceback (most recent call last):
+    ...
+    ValueError: line 2: expected 2 dates, found 1
+    """
+    date_fmt = compile_format(date_fmt)
+    days_table()
+    for lineno, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            fields = line.rstrip(b"\r\n").split(delimiter)
+            to_days = date_fmt.to_days_bytes
+        else:
+            fields = line.rstrip("\r\n").split(delimiter)
+            to_days = date_fmt.to_days
+        try:
+            if len(fields) != 2:
+                raise ValueError("expected 2 dates, found {}".format(len(fields)))
+            days = to_days(fields[0]) - to_days(fields[1])
+        except ValueError as e:
+            raise ValueError("line {}: {}".format(lineno, e))
+        if days != 0:
+            days = abs(days) - 1
+        yield days
+
+def validate_lines(lines, date_fmt=DEFAULT_DATE_FORMAT, delimiter=None, \
+        column=None, quarantine=None, name=None):
+    """Check every date on the given lines (strings or bytes) without counting
+    any days, returning the number of dates with each status (see
+    DateFormat.to_days_status) as a list indexed by status. Each line is split
+    on delimiter, or on any whitespace if delimiter is None; every field is a
+    date unless column is given, in which case only that field is (counting
+    from the end if column is negative). A line without any dates counts as
+    one unparseable date. If quarantine is given, the number of each line with
+    an invalid date is written to it, one per line, preceded by name and a
+    colon if name is given.
+    >>> counts = validate_lines(["03/01/1989 03/08/1983", "29/02/2100 01/13/2000"])
+    >>> dict(zip(STATUS_REASONS, counts))
+    {'ok': 2, 'invalid day': 1, 'invalid month': 1, 'invalid year': 0, 'unparseable': 0}
+    """
+    date_fmt = compile_format(date_fmt)
+    to_days_status = date_fmt.to_days_status
+    days_table()
+    counts = [0] * len(STATUS_REASONS)
+    for lineno, line in enumerate(lines, 1):
+        fields = line.split(delimiter)
+        if column is not None:
+            try:
+                fields = [fields[column]]
+            except IndexError:
+                fields = []
+        if not fields:
+            fields = [line[:0]]
+        invalid = False
+        for field in fields:
+            status = to_days_status(field)[1]
+            counts[status] += 1
+            invalid = invalid or status != STATUS_OK
+        if invalid and quarantine is not None:
+            if name is None:
+                quarantine.write("{}\n".format(lineno))
+            else:
+                quarantine.write("{}:{}\n".format(name, lineno))
+    return counts
+
+def successive_diffs(dates, date_fmt=DEFAULT_DATE_FORMAT):
+    """Return the number of whole days between each of the given dates and the
+    previous one, yielding one result for every date after the first. Each
+    date is parsed exactly once. Dates may be strings or bytes, and may be
+    followed by anything (such as a newline) after the end of date_fmt.
+    >>> list(successive_diffs(["02/06/1983", "22/06/1983", "23/06/1983"]))
+    [19, 0]
+    >>> list(successive_diffs([b"1989-01-03", b"1983-08-03"], "YYYY-MM-DD"))
+    [1979]
+    """
+    date_fmt = compile_format(date_fmt)
+    days_table()
+    previous = None
+    for lineno, date in enumerate(dates, 1):
+        try:
+            if isinstance(date, bytes):
+                days = date_fmt.to_days_bytes(date)
+            else:
+                days = date_fmt.to_days(date)
+        except ValueError as e:
+            raise ValueError("line {}: {}".format(lineno, e))
+        if previous is not None:
+            diff = days - previous
+            if diff != 0:
+                diff = abs(diff) - 1
+            yield diff
+        previous = days
+
+def datediff_fixed_width(path, offset1, offset2, date_fmt=DEFAULT_DATE_FORMAT, \
+        record_length=None):
+    """Return the number of whole days between the two dates in each record of
+    the file at path, yielding one result per record. The dates start at
+    offset1 and offset2 of each record. Records are either record_length bytes
+    long, or, if record_length is None, terminated by a newline.
+
+    The file is memory-mapped and its dates are parsed in place by
+    DateFormat.to_days_bytes, so memory use does not grow with the size of the
+    file.
+    """
+    import mmap
+    date_fmt = compile_format(date_fmt)
+    to_days = date_fmt.to_days_bytes
+    width = max(offset1, offset2) + len(date_fmt.date_fmt)
+    days_table()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            record = 0
+            while start < size:
+                record += 1
+                if record_length is None:
+                    end = data.find(b"\n", start)
+                    if end < 0:
+                        end = size
+                    next_start = end + 1
+                else:
+                    end = next_start = min(start + record_length, size)
+                try:
+                    if end - start < width:
+                        raise ValueError("expected at least {} bytes, found " \
+                                "{}".format(width, end - start))
+                    days = to_days(data, start + offset1) - \
+                            to_days(data, start + offset2)
+                except ValueError as e:
+                    raise ValueError("record {}: {}".format(record, e))
+                if days != 0:
+                    days = abs(days) - 1
+                yield days
+                start = next_start
+
+def _verify_years(years):
+    """Check every day, month, and year combination for the given years for
+    verify_exhaustive, returning a description of each failure.
+    """
+    from datetime import date
+    fmt = compile_format("DD/MM/YYYY")
+    table = days_table()
+    failures = []
+    for year in years:
+        for month in range(0, 14):
+            for day in range(0, 33):
+                try:
+                    expected = date(year, month, day).toordinal() - 1
+                except ValueError:
+                    expected = None
+                try:
+                    validate(day, month, year)
+                except ValueError:
+                    if expected is not None:
+                        failures.append("validate rejects valid date " \
+                                "{:02}/{:02}/{}".format(day, month, year))
+                    continue
+                if expected is None:
+                    failures.append("validate accepts invalid date " \
+                            "{:02}/{:02}/{}".format(day, month, year))
+                    continue
+                string = "{:02}/{:02}/{}".format(day, month, year)
+                actual = [days_since_epoch(day, month, year), \
+                        table[year*372 + month*31 + day - _TABLE_BASE], \
+                        fmt.to_days(string), \
+                        fmt.to_days_bytes(string.encode("ascii"))]
+                if actual != [expected] * len(actual):
+                    failures.append("{} should be {} days since the epoch, " \
+                            "not {}".format(string, expected, actual))
+        for month in range(1, 13):
+            for day in range(1, 32):
+                valid = table[year*372 + month*31 + day - _TABLE_BASE] != \
+                        INVALID_DATE
+                try:
+                    date(year, month, day)
+                except ValueError:
+                    if valid:
+                        failures.append("days_table accepts invalid date " \
+                                "{:02}/{:02}/{}".format(day, month, year))
+    return failures
+
+def verify_exhaustive(jobs=None):
+    """Check every date between MIN_YEAR and MAX_YEAR against Python's datetime
+    library, returning a description of each failure. Every valid date must be
+    accepted by validate, and days_since_epoch, days_table, and
+    DateFormat.to_days and to_days_bytes must agree with
+    datetime.date.toordinal. Every invalid day and month combination in range
+    must be rejected by validate and days_table. Years are checked in chunks by
+    a pool of jobs processes (by default, one per CPU).
+    """
+    years = range(MIN_YEAR, MAX_YEAR+1)
+    chunks = [years[i:i+50] for i in range(0, len(years), 50)]
+    if jobs == 1:
+        results = map(_verify_years, chunks)
+        return [failure for result in results for failure in result]
+    import multiprocessing
+    with multiprocessing.Pool(jobs) as pool:
+        results = pool.map(_verify_years, chunks)
+    return [failure for result in results for failure in result]
+
+def _column_index(column, header):
+    """Return the index of column, which is either an integer index or the
+    name of a column in header.
+    >>> _column_index("end", ["id", "start", "end"])
+    2
+    >>> _column_index("1", None)
+    1
+    """
+    if header is not None and column in header:
+        return header.index(column)
+    try:
+        return int(column)
+    except ValueError:
+        raise ValueError("no column named {!r}".format(column))
+
+def _datediff_csv_chunk(task):
+    """Process the rows of a CSV file between two byte offsets for
+    datediff_csv, returning the rows with the number of whole days appended
+    as CSV text together with the number of rows processed. If a row cannot
+    be processed, the text is None and the row count is replaced by the
+    position of the row in this chunk and the reason it could not be
+    processed.
+    """
+    import csv
+    import io
+    path, start, end, column1, column2, date_fmt, cache_size = task
+    # Worker processes that were spawned rather than forked do not inherit the
+    # parse cache of the parent.
+    if cache_size is not None and _parse_cache is None:
+        enable_parse_cache(cache_size)
+    to_days = compile_format(date_fmt).to_days
+    days_table()
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    count = 0
+    for count, row in enumerate(csv.reader(io.StringIO(text, newline="")), 1):
+        try:
+            if len(row) <= max(column1, column2):
+                raise ValueError("expected at least {} columns, found " \
+                        "{}".format(max(column1, column2) + 1, len(row)))
+            days = to_days(row[column1]) - to_days(row[column2])
+        except ValueError as e:
+            return None, (count, str(e))
+        if days != 0:
+            days = abs(days) - 1
+        row.append(days)
+        writer.writerow(row)
+    return out.getvalue(), count
+
+def _imap_bounded(pool, func, tasks, window):
+    """Like pool.imap, but with at most window tasks submitted whose results
+    have not yet been consumed, so that results do not accumulate in memory
+    when they are consumed more slowly than they are produced.
+    """
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= window:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (task,)))
+    while pending:
+        yield pending.popleft().get()
+
+def datediff_csv(path, out, column1, column2, date_fmt=DEFAULT_DATE_FORMAT, \
+        header=True, name="datediff", jobs=None, chunk_size=1 << 24):
+    """Read the CSV file at path and write it to the text file out with an
+    extra column holding the number of whole days between the dates in
+    column1 and column2. Columns are given by index, or by name if the file
+    has a header row, in which case name is appended to the header.
+
+    The file is split into byte ranges of roughly chunk_size bytes, aligned to
+    line boundaries, that are processed in parallel by a pool of jobs worker
+    processes (by default, one per CPU) and written out in their original
+    order. Because of this, fields must not contain line breaks. If the parse
+    cache is enabled, each worker process uses a parse cache of the same size.
+    """
+    import csv
+    date_fmt = compile_format(date_fmt).date_fmt
+    cache_size = None if _parse_cache is None else _parse_cache.maxsize
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        # Spreadsheets often start UTF-8 files with a byte order mark.
+        if f.read(3) != b"\xef\xbb\xbf":
+            f.seek(0)
+        header_row = None
+        if header:
+            line = f.readline()
+            if not line:
+                return
+            header_row = next(csv.reader([line.decode("utf-8")]))
+            csv.writer(out, lineterminator="\n").writerow(header_row + [name])
+        column1 = _column_index(column1, header_row)
+        column2 = _column_index(column2, header_row)
+        tasks = []
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + chunk_size, size) - 1)
+            f.readline()
+            end = f.tell()
+            tasks.append((path, start, end, column1, column2, date_fmt, cache_size))
+            start = end
+
+    lineno = 1 if header else 0
+    if jobs == 1 or len(tasks) <= 1:
+        results = map(_datediff_csv_chunk, tasks)
+        pool = None
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs)
+        results = _imap_bounded(pool, _datediff_csv_chunk, tasks, \
+                2 * (jobs or os.cpu_count() or 1))
+    try:
+        for text, count in results:
+            if text is None:
+                raise ValueError("line {}: {}".format(lineno + count[0], count[1]))
+            out.write(text)
+            lineno += count
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+def _split_address(address):
+    """Split a server address into a host and port if it has the form
+    HOST:PORT, or return the address and None if it is the path of a Unix
+    domain socket.
+    >>> _split_address("localhost:8080")
+    ('localhost', 8080)
+    >>> _split_address("/tmp/datediff.sock")
+    ('/tmp/datediff.sock', None)
+    """
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address, None
+
+def _serve_line(line, date_fmt=DEFAULT_DATE_FORMAT):
+    """Answer a single request of the server's line protocol. A request holds
+    two dates and, optionally, their format (by default, date_fmt), separated
+    by whitespace. The response is the number of whole days between the dates, or the reason the
+    request could not be answered prefixed by "error: ".
+    >>> _serve_line("02/06/1983 22/06/1983")
+    '19'
+    >>> _serve_line("1989-01-03 1983-08-03 YYYY-MM-DD")
+    '1979'
+    >>> _serve_line("29/02/2100 01/01/2000")
+    'error: cannot parse date: invalid day'
+    >>> _serve_line("1989-01-03 1983-08-03", "YYYY-MM-DD")
+    '1979'
+    """
+    fields = line.split()
+    try:
+        if not 2 <= len(fields) <= 3:
+            raise ValueError("expected 2 dates and an optional format, " \
+                    "found {} fields".format(len(fields)))
+        if len(fields) == 2:
+            fields.append(date_fmt)
+        return str(datediff(*fields))
+    except ValueError as e:
+        return "error: " + str(e)
+
+def make_server(address, date_fmt=DEFAULT_DATE_FORMAT):
+    """Return a server that answers datediff requests on address, which is
+    either HOST:PORT for a TCP socket or the path of a Unix domain socket.
+    Each connection may send any number of newline-terminated requests (see
+    _serve_line), and receives one newline-terminated response for each.
+    Requests that do not give a format use date_fmt. Call serve_forever on the
+    returned server to start answering requests.
+    """
+    import socketserver
+    date_fmt = compile_format(date_fmt).date_fmt
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                response = _serve_line(line.decode("ascii", "replace"), date_fmt)
+                self.wfile.write(response.encode("ascii", "backslashreplace") + b"\n")
+
+    days_table()
+    host, port = _split_address(address)
+    if port is None:
+        server_class = socketserver.ThreadingUnixStreamServer
+    else:
+        server_class = socketserver.ThreadingTCPServer
+        address = host, port
+
+    class Server(server_class):
+        allow_reuse_address = True
+        daemon_threads = True
+
+    return Server(address, Handler)
+
+def query(address, date1, date2, date_fmt=None):
+    """Ask the server listening on address (see make_server) for the number of
+    whole days between two dates. If date_fmt is None, the server uses the
+    default date format.
+    """
+    import socket
+    host, port = _split_address(address)
+    if port is None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(host)
+    else:
+        sock = socket.create_connection((host, port))
+    fields = [date1, date2]
+    if date_fmt is not None:
+        fields.append(date_fmt)
+    with sock, sock.makefile("rwb") as f:
+        f.write(" ".join(fields).encode("ascii", "backslashreplace") + b"\n")
+        f.flush()
+        response = f.readline().decode("ascii").rstrip("\n")
+    if response.startswith("error: "):
+        raise ValueError(response[len("error: "):])
+    return int(response)
+
+if __name__ == "__main__":
 
     import argparse
 
     def date_format(string):
-        if string.count("YYYY") != 1 or string.count("MM") != 1 or \
-                string.count("DD") != 1:
+        if string == "auto":
+            return string
+        try:
+            compile_format(string)
+        except ValueError:
             raise argparse.ArgumentTypeError("must contain exactly one " \
                     "occurrence of each DD, MM, and YYYY")
         return string
 
+    def sniff(lines, fields, size=1000):
+        """Detect the date format of lines from the dates returned by fields
+        for up to size lines, returning it along with an iterator over every
+        line, including those that were read to detect the format.
+        """
+        from itertools import chain, islice
+        lines = iter(lines)
+        sample = list(islice(lines, size))
+        try:
+            date_fmt = detect_format(d for line in sample for d in fields(line))
+        except ValueError as e:
+            parser.exit(1, "{}: error: {}\n".format(parser.prog, e))
+        return date_fmt, chain(sample, lines)
+
+    def input_files(names):
+        """Open each of the named files, or standard input for -, in binary
+        mode, closing each file when the next is requested.
+        """
+        for name in names or ["-"]:
+            if name == "-":
+                f = sys.stdin.buffer
+            else:
+                f = open(name, "rb")
+            with f:
+                yield f
+
     parser = argparse.ArgumentParser(description="Count the number of whole " \
             "days between two events. Dates must range between 01/01/{} and " \
             "31/12/{}. The order of dates passed as command-line arguments " \
             "does not matter.".format(MIN_YEAR, MAX_YEAR))
-    parser.add_argument("date1", help="the date of the first event")
-    parser.add_argument("date2", help="the date of the second event")
-    parser.add_argument("--date-fmt", default=DEFAULT_DATE_FORMAT, \
-            type=date_format, help="the format of dates passed as " \
-            "command-line arguments (default: {})".format(DEFAULT_DATE_FORMAT))
+    parser.add_argument("date1", nargs="?", help="the date of the first " \
+            "event, or - alone to read pairs of dates from standard input as " \
+            "with --batch")
+    parser.add_argument("date2", nargs="?", help="the date of the second event")
+    parser.add_argument("--date-fmt", type=date_format, help="the format of " \
+            "dates passed as command-line arguments, or auto to detect it from " \
+            "the dates in single, batch, successive, and reference modes " \
+            "(default: {}, or the server's format with --connect)".format( \
+            DEFAULT_DATE_FORMAT))
+    parser.add_argument("--batch", nargs="*", metavar="FILE", help="read " \
+            "pairs of dates, one pair per line, from each FILE (or standard " \
+            "input if no FILE is given or FILE is -) and print the result " \
+            "for each line")
+    parser.add_argument("--successive", nargs="*", metavar="FILE", help="read " \
+            "dates, one per line, from each FILE (or standard input if no " \
+            "FILE is given or FILE is -) and print the number of whole days " \
+            "between each date and the previous one in the same FILE")
+    parser.add_argument("--validate-only", nargs="*", metavar="FILE", \
+            help="check every date in each FILE (or standard input if no " \
+            "FILE is given or FILE is -) and print the number of dates that " \
+            "are valid and invalid for each reason")
+    parser.add_argument("--column", type=int, help="check only the date in " \
+            "this field (counting from 0, or from -1 for the last field) of " \
+            "each line in validation mode")
+    parser.add_argument("--quarantine", metavar="FILE", help="write the " \
+            "number of each line with an invalid date to FILE in validation " \
+            "mode, preceded by the name of its file and a colon if several " \
+            "files are checked")
+    parser.add_argument("--reference", nargs="+", metavar=("DATE", "FILE"), \
+            help="read dates, one per line, from each FILE (or standard input " \
+            "if no FILE is given or FILE is -) and print the number of whole " \
+            "days between DATE and each of them")
+    parser.add_argument("--delimiter", help="the string separating the " \
+            "dates on each line in batch and validation modes (default: any " \
+            "whitespace)")
+    parser.add_argument("--csv", metavar="FILE", help="copy the CSV file FILE " \
+            "to standard output, adding a column holding the number of whole " \
+            "days between the dates in the two --columns")
+    parser.add_argument("--columns", nargs=2, metavar="COLUMN", help="the " \
+            "names or indices of the columns holding the dates in CSV mode")
+    parser.add_argument("--no-header", action="store_true", help="the CSV " \
+            "file has no header row")
+    parser.add_argument("--jobs", type=int, help="the number of processes " \
+            "used in CSV and verification modes (default: one per CPU)")
+    parser.add_argument("--fixed-width", metavar="FILE", help="print the " \
+            "number of whole days between the dates at the two --offsets of " \
+            "each record of the fixed-width file FILE")
+    parser.add_argument("--offsets", nargs=2, type=int, metavar="OFFSET", \
+            help="the byte offsets of the dates in each record in " \
+            "fixed-width mode")
+    parser.add_argument("--record-length", type=int, help="the length in " \
+            "bytes of each record in fixed-width mode (default: records are " \
+            "terminated by newlines)")
+    parser.add_argument("--serve", metavar="ADDRESS", help="answer requests " \
+            "on ADDRESS, either HOST:PORT or the path of a Unix domain socket, " \
+            "until interrupted, using --date-fmt for requests that do not give " \
+            "a format")
+    parser.add_argument("--connect", metavar="ADDRESS", help="ask the " \
+            "server listening on ADDRESS to count the days between date1 and " \
+            "date2")
+    parser.add_argument("--verify-exhaustive", action="store_true", \
+            help="check every date between 01/01/{} and 31/12/{} against " \
+            "Python's datetime library and exit".format(MIN_YEAR, MAX_YEAR))
+    parser.add_argument("--parse-cache", type=int, metavar="SIZE", help="cache " \
+            "up to SIZE of the most recently parsed dates in CSV and server " \
+            "modes, which is faster when inputs repeat the same dates (its hit " \
+            "count is approximate when shared by the server's threads)")
+    parser.add_argument("--self-test", action="store_true", help="run the " \
+            "doctest examples in this module and exit")
     args = parser.parse_args()
+    if args.date1 == "-" and args.date2 is None and args.batch is None:
+        args.date1 = None
+        args.batch = ["-"]
+    # Only an explicit format is sent to the server, which has its own default.
+    connect_fmt = args.date_fmt
+    if args.date_fmt is None:
+        args.date_fmt = DEFAULT_DATE_FORMAT
+    if args.date_fmt == "auto" and (args.csv or args.fixed_width or \
+            args.serve or args.connect or args.validate_only is not None):
+        parser.error("--date-fmt auto is only supported in single, batch, " \
+                "successive, and reference modes")
+    if args.parse_cache is not None:
+        enable_parse_cache(args.parse_cache)
 
-    print(datediff(**vars(args)))
+    if args.self_test:
+        import doctest
+        failures, _ = doctest.testmod()
+        sys.exit(1 if failures else 0)
+    elif args.verify_exhaustive:
+        failures = verify_exhaustive(args.jobs)
+        for failure in failures:
+            print(failure)
+        if failures:
+            sys.exit(1)
+        print("verified every date between 01/01/{} and 31/12/{}".format( \
+                MIN_YEAR, MAX_YEAR))
+    elif args.batch is not None:
+        if args.date1 is not None:
+            parser.error("dates cannot be passed as arguments with --batch")
+        delimiter = args.delimiter
+        if delimiter is not None:
+            delimiter = delimiter.encode()
+        date_fmt = args.date_fmt
+        for lines in input_files(args.batch):
+            if date_fmt == "auto":
+                date_fmt, lines = sniff(lines, lambda line: line.split(delimiter))
+            sys.stdout.writelines(map("{}\n".format, \
+                    datediff_lines(lines, date_fmt, delimiter)))
+    elif args.validate_only is not None:
+        if args.date1 is not None:
+            parser.error("dates cannot be passed as arguments with " \
+                    "--validate-only")
+        delimiter = args.delimiter
+        if delimiter is not None:
+            delimiter = delimiter.encode()
+        names = args.validate_only or ["-"]
+        quarantine = None
+        if args.quarantine is not None:
+            quarantine = open(args.quarantine, "w")
+        counts = [0] * len(STATUS_REASONS)
+        try:
+            for name, f in zip(names, input_files(names)):
+                file_counts = validate_lines(f, args.date_fmt, delimiter, \
+                        args.column, quarantine, name if len(names) > 1 else None)
+                counts = [a + b for a, b in zip(counts, file_counts)]
+        finally:
+            if quarantine is not None:
+                quarantine.close()
+        for reason, count in zip(STATUS_REASONS, counts):
+            print("{}: {}".format(reason, count))
+        if sum(counts) != counts[STATUS_OK]:
+            sys.exit(1)
+    elif args.reference is not None:
+        if args.date1 is not None:
+            parser.error("dates cannot be passed as arguments with --reference")
+        reference, names = args.reference[0], args.reference[1:] or ["-"]
+        date_fmt = args.date_fmt
+        for name, lines in zip(names, input_files(names)):
+            if date_fmt == "auto":
+                from itertools import chain
+                date_fmt, lines = sniff(chain([reference.encode()], lines), \
+                        lambda line: [line])
+                next(lines)
+            date_fmt = compile_format(date_fmt)
+            try:
+                days = date_fmt.to_days(reference)
+            except ValueError as e:
+                parser.error("invalid --reference: {}".format(e))
+            try:
+                sys.stdout.writelines(map("{}\n".format, _iter_datediff_from( \
+                        days, lines, date_fmt)))
+            except ValueError as e:
+                if len(names) > 1:
+                    e = "{}: {}".format(name, e)
+                parser.exit(1, "{}: error: {}\n".format(parser.prog, e))
+    elif args.successive is not None:
+        if args.date1 is not None:
+            parser.error("dates cannot be passed as arguments with --successive")
+        # Each file is a separate sequence, so no interval spans two files.
+        names = args.successive or ["-"]
+        date_fmt = args.date_fmt
+        for name, lines in zip(names, input_files(names)):
+            if date_fmt == "auto":
+                date_fmt, lines = sniff(lines, lambda line: [line])
+            try:
+                sys.stdout.writelines(map("{}\n".format, \
+                        successive_diffs(lines, date_fmt)))
+            except ValueError as e:
+                if len(names) > 1:
+                    e = "{}: {}".format(name, e)
+                parser.exit(1, "{}: error: {}\n".format(parser.prog, e))
+    elif args.csv is not None:
+        if args.columns is None:
+            parser.error("--columns is required with --csv")
+        datediff_csv(args.csv, sys.stdout, *args.columns, \
+                date_fmt=args.date_fmt, header=not args.no_header, \
+                jobs=args.jobs)
+    elif args.fixed_width is not None:
+        if args.offsets is None:
+            parser.error("--offsets is required with --fixed-width")
+        sys.stdout.writelines(map("{}\n".format, datediff_fixed_width( \
+                args.fixed_width, *args.offsets, date_fmt=args.date_fmt, \
+                record_length=args.record_length)))
+    elif args.serve is not None:
+        import signal
+        server = make_server(args.serve, args.date_fmt)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if _split_address(args.serve)[1] is None:
+                os.remove(args.serve)
+    elif args.date2 is None:
+        parser.error("the following arguments are required: date1, date2")
+    elif args.connect is not None:
+        print(query(args.connect, args.date1, args.date2, connect_fmt))
+    else:
+        date_fmt = args.date_fmt
+        if date_fmt == "auto":
+            date_fmt, _ = sniff([args.date1, args.date2], lambda date: [date])
+        print(datediff(args.date1, args.date2, date_fmt))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+"""Benchmarks for datediff. Each stage of the calculation is timed on its own,
+followed by the start-up time of a one-off run of the script and the
+throughput of the batch and streaming functions for a number of date pairs.
+Results are written as JSON so that runs from different commits can be
+compared with --compare.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import os
+import random
+import subprocess
+import sys
+import timeit
+from datetime import date, timedelta
+
+import datediff
+
+DEFAULT_SIZES = [1000, 1000000, 10000000]
+# Number of distinct dates generated; larger batches cycle through them.
+UNIQUE_DATES = 100000
+
+def random_dates(n, seed=0):
+    """Return n random dates between MIN_YEAR and MAX_YEAR formatted according
+    to the default date format.
+    """
+    rng = random.Random(seed)
+    first = date(datediff.MIN_YEAR, 1, 1)
+    days = (date(datediff.MAX_YEAR, 12, 31) - first).days
+    return [(first + timedelta(days=rng.randrange(days+1))).strftime("%d/%m/%Y") \
+            for _ in range(n)]
+
+def best(stmt, number, repeat=5):
+    """Return the best time per call of stmt, in seconds, over repeat runs of
+    number calls each.
+    """
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number
+
+def stage_benchmarks(number=100000):
+    """Return the time per call, in seconds, of each stage of datediff."""
+    fmt = datediff.compile_format(datediff.DEFAULT_DATE_FORMAT)
+    datediff.days_table()
+    stages = {
+        "is_leap": lambda: datediff.is_leap(2000),
+        "validate": lambda: datediff.validate(29, 2, 2000),
+        "parse": lambda: datediff.parse("29/02/2000", "DD/MM/YYYY"),
+        "day_of_year": lambda: datediff.day_of_year(29, 2, 2000),
+        "days_since_epoch": lambda: datediff.days_since_epoch(29, 2, 2000),
+        "DateFormat.to_days": lambda: fmt.to_days("29/02/2000"),
+        "DateFormat.to_days_bytes": lambda: fmt.to_days_bytes(b"29/02/2000"),
+        "datediff": lambda: datediff.datediff("03/01/1989", "03/08/1983"),
+    }
+    return {name: best(stmt, number) for name, stmt in stages.items()}
+
+def startup_benchmarks(repeat=10):
+    """Return the best wall-clock time, in seconds, of repeat one-off runs of
+    the interpreter alone and of the datediff script counting the days
+    between two dates, so that changes to its import-time cost show up.
+    """
+    script = os.path.abspath(datediff.__file__)
+    commands = {
+        "python": [sys.executable, "-c", "pass"],
+        "datediff.py": [sys.executable, script, "01/01/2000", "03/01/2000"],
+    }
+    return {name: best(lambda: subprocess.run(command, check=True, \
+            stdout=subprocess.DEVNULL), 1, repeat) for name, command in commands.items()}
+
+def throughput_benchmarks(sizes):
+    """Return the number of date pairs per second processed by each batch and
+    streaming function, for each number of pairs in sizes.
+    """
+    dates = random_dates(UNIQUE_DATES)
+    lines = ["{} {}\n".format(a, b) for a, b in zip(dates, reversed(dates))]
+    np = None
+    try:
+        import numpy as np
+    except ImportError:
+        pass
+    results = {}
+    for n in sizes:
+        dates1 = list(itertools.islice(itertools.cycle(dates), n))
+        dates2 = dates1[::-1]
+        runs = {
+            "datediff": lambda: [datediff.datediff(a, b) for a, b in zip(dates1, dates2)],
+            "datediff_many": lambda: datediff.datediff_many(dates1, dates2),
+            "datediff_lines": lambda: sum(1 for _ in datediff.datediff_lines( \
+                    itertools.islice(itertools.cycle(lines), n))),
+        }
+        if np is not None:
+            array1 = np.array(dates1)
+            array2 = np.array(dates2)
+            runs["datediff_many[numpy]"] = lambda: datediff.datediff_many(array1, array2)
+        for name, run in runs.items():
+            results["{}/{}".format(name, n)] = n / best(run, 1, repeat=3)
+        del dates1, dates2
+    return results
+
+def compare(baseline, results, tolerance):
+    """Print to standard error how much each result regressed compared to
+    baseline (negative values are improvements), so that the report does not
+    mix with the JSON results, returning the names of results that regressed
+    by more than tolerance (a fraction).
+    """
+    regressions = []
+    for section, higher_is_better in [("stages", False), ("startup", False), \
+            ("throughput", True)]:
+        for name, value in sorted(results[section].items()):
+            old = baseline.get(section, {}).get(name)
+            if old is None:
+                continue
+            change = value / old - 1
+            if higher_is_better:
+                change = -change
+            print("{:40} {:+7.1%}".format(section + ":" + name, change), \
+                    file=sys.stderr)
+            if change > tolerance:
+                regressions.append(name)
+    return regressions
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark each stage of " \
+            "datediff and the throughput of its batch functions.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, \
+            help="the numbers of date pairs used to measure throughput " \
+            "(default: {})".format(" ".join(map(str, DEFAULT_SIZES))))
+    parser.add_argument("--output", help="write the JSON results to OUTPUT " \
+            "instead of standard output")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare the " \
+            "results with the JSON results in BASELINE, printing the " \
+            "comparison to standard error, and exit with status 1 if any " \
+            "regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="the " \
+            "fraction by which a result may regress before it is reported " \
+            "(default: 0.2)")
+    args = parser.parse_args()
+
+    results = {
+        "python": platform.python_version(),
+        "stages": stage_benchmarks(),
+        "startup": startup_benchmarks(),
+        "throughput": throughput_benchmarks(args.sizes),
+    }
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
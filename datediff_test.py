@@ -1,12 +1,90 @@
 import unittest
 from datetime import date, timedelta
+import doctest
+import io
+import multiprocessing
+import os
 import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 
-from datediff import datediff
+import datediff as datediff_module
+
+from datediff import datediff, datediff_many, datediff_matrix, datediff_lines, datediff_csv, \
+        successive_diffs, datediff_from, datediff_many_status, validate_lines, STATUS_OK, STATUS_INVALID_DAY, \
+        STATUS_INVALID_MONTH, STATUS_INVALID_YEAR, STATUS_UNPARSEABLE, \
+        datediff_fixed_width, make_server, query, compile_format, DateFormat, Date, DateIndex, \
+        days_table, days_since_epoch, validate, verify_exhaustive, INVALID_DATE, \
+        enable_parse_cache, disable_parse_cache, clear_parse_cache, parse_cache_info, \
+        from_days_since_epoch, from_days_since_epoch_many, add_days, \
+        business_days_between, HolidayCalendar, weekday, detect_format, \
+        days_to_datetime64, datetime64_to_days, from_day_number, to_day_number, \
+        from_day_number_many, to_day_number_many
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 MIN_YEAR = 1901
 MAX_YEAR = 2999
 
+# Differential testing: datediff_many is checked against datetime for many
+# random pairs of dates, in chunks spread over a pool of processes.
+RANDOM_PAIRS = int(os.environ.get("DATEDIFF_RANDOM_PAIRS", 1000000))
+RANDOM_CHUNK = 50000
+MAX_MISMATCHES = 10
+
+def format_ordinal(ordinal):
+    d = date.fromordinal(ordinal)
+    return "{:02}/{:02}/{:04}".format(d.day, d.month, d.year)
+
+def check_pairs(ordinals1, ordinals2, use_numpy=False):
+    """Compare datediff_many with the difference between the given proleptic
+    Gregorian ordinals (see datetime.date.toordinal), returning up to
+    MAX_MISMATCHES (date1, date2, expected, actual) tuples.
+    """
+    dates1 = [format_ordinal(o) for o in ordinals1]
+    dates2 = [format_ordinal(o) for o in ordinals2]
+    if use_numpy:
+        actual = datediff_many(numpy.array(dates1), numpy.array(dates2)).tolist()
+    else:
+        actual = datediff_many(dates1, dates2)
+    mismatches = []
+    for i, (o1, o2) in enumerate(zip(ordinals1, ordinals2)):
+        expected = max(abs(o1 - o2) - 1, 0)
+        if actual[i] != expected:
+            mismatches.append((dates1[i], dates2[i], expected, actual[i]))
+            if len(mismatches) == MAX_MISMATCHES:
+                break
+    return mismatches
+
+def check_random_pairs(task):
+    """Check n random pairs of dates generated from seed (see check_pairs)."""
+    seed, n, use_numpy = task
+    rng = random.Random(seed)
+    first = date(MIN_YEAR, 1, 1).toordinal()
+    last = date(MAX_YEAR, 12, 31).toordinal()
+    ordinals1 = [rng.randint(first, last) for _ in range(n)]
+    ordinals2 = [rng.randint(first, last) for _ in range(n)]
+    return check_pairs(ordinals1, ordinals2, use_numpy)
+
+def run_differential(tasks, check=check_random_pairs):
+    """Run check over tasks in a pool of processes, returning the first
+    MAX_MISMATCHES mismatches found.
+    """
+    mismatches = []
+    with multiprocessing.Pool() as pool:
+        for result in pool.imap(check, tasks):
+            mismatches.extend(result)
+            if len(mismatches) >= MAX_MISMATCHES:
+                break
+    return mismatches[:MAX_MISMATCHES]
+
 class DateDiffTest(unittest.TestCase):
 
     def _test(self, date1, date2, expected=None, symmetrical=True):
@@ -83,22 +161,28 @@ class DateDiffTest(unittest.TestCase):
         self._test(date(2998, 12, 31), date(2999, 12, 31))
 
     # Randomly generated
-    @staticmethod
-    def random_date_in_year(year):
-        is_leap = year % 400 == 0 or (year % 4 == 0 and year % 100 != 0)
-        if is_leap:
-            offset = random.randrange(0, 366)
-        else:
-            offset = random.randrange(0, 365)
-        return date(year, 1, 1) + timedelta(days=offset)
-    def test_random_dates(self, days_per_year=1):
-        for year1 in range(MIN_YEAR, MAX_YEAR+1):
-            for _ in range(days_per_year):
-                date1 = self.random_date_in_year(year1)
-                for year2 in range(MIN_YEAR, MAX_YEAR+1):
-                    for _ in range(days_per_year):
-                        date2 = self.random_date_in_year(year2)
-                        self._test(date1, date2)
+    def _test_differential(self, tasks, check=check_random_pairs):
+        mismatches = run_differential(tasks, check)
+        self.assertEqual(mismatches, [], msg="\n".join("{}–{} should be {}, " \
+                "not {}".format(*mismatch) for mismatch in mismatches))
+    def test_random_dates(self):
+        self._test_differential([(seed, RANDOM_CHUNK, False) for seed in \
+                range(0, RANDOM_PAIRS, RANDOM_CHUNK)])
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_random_dates_numpy(self):
+        self._test_differential([(seed, RANDOM_CHUNK, True) for seed in \
+                range(1, RANDOM_PAIRS, RANDOM_CHUNK)])
+    def test_year_boundaries(self):
+        boundaries = []
+        for year in range(MIN_YEAR, MAX_YEAR+1):
+            for month, day in [(1, 1), (2, 28), (3, 1), (12, 31)]:
+                boundaries.append(date(year, month, day).toordinal())
+            if year % 400 == 0 or (year % 4 == 0 and year % 100 != 0):
+                boundaries.append(date(year, 2, 29).toordinal())
+        rng = random.Random(0)
+        partners = [rng.choice(boundaries) for _ in boundaries]
+        self.assertEqual(check_pairs(boundaries, partners), [])
+        self.assertEqual(check_pairs(boundaries, boundaries[::-1]), [])
 
     # Format
     def test_default_fmt(self):
@@ -137,6 +221,816 @@ class DateDiffTest(unittest.TestCase):
         self._test_raises("31/12/1900", "01/01/1901", ValueError, "cannot parse date: invalid year")
         self._test_raises("01/01/3000", "31/12/2999", ValueError, "cannot parse date: invalid year")
 
+class DateFormatTest(unittest.TestCase):
+
+    def test_parse(self):
+        fmt = compile_format("MM/DD/YYYY")
+        self.assertEqual(fmt.parse("01/03/1989"), (3, 1, 1989))
+        self.assertEqual(fmt.to_days("01/03/1989"), date(1989, 1, 3).toordinal() - 1)
+    def test_cached(self):
+        self.assertIs(compile_format("YYYY-MM-DD"), compile_format("YYYY-MM-DD"))
+        fmt = DateFormat("YYYY-MM-DD")
+        self.assertIs(compile_format(fmt), fmt)
+    def test_compiled_datediff(self):
+        fmt = compile_format("YYYY-MM-DD")
+        self.assertEqual(datediff("1989-01-03", "1983-08-03", fmt), 1979)
+    def test_invalid_format(self):
+        for date_fmt in ["DD/MM/YY", "DD/MM/YYYY/DD", "D/M/Y", ""]:
+            with self.assertRaises(ValueError):
+                compile_format(date_fmt)
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError) as cm:
+            compile_format("DD/MM/YYYY").parse("31/04/2100")
+        self.assertEqual("cannot parse date: invalid day", str(cm.exception))
+
+    def test_to_days_bytes(self):
+        fmt = compile_format("DD/MM/YYYY")
+        for string in ["01/01/1901", "29/02/2000", "31/12/2999", "+3/01/1989", " 3/01/1989"]:
+            expected = fmt.to_days(string)
+            self.assertEqual(fmt.to_days_bytes(string.encode()), expected)
+            self.assertEqual(fmt.to_days_bytes(memoryview(b"xx" + string.encode()), 2), expected)
+    def test_to_days_bytes_invalid(self):
+        fmt = compile_format("DD/MM/YYYY")
+        for data, message in [(b"29/02/2100", "invalid day"), (b"01/13/2000", "invalid month"), \
+                (b"01/01/3000", "invalid year"), (b"0:/01/2000", "invalid literal for int() with base 10: b'0:'"), \
+                (b"01/01/20", "invalid year")]:
+            with self.assertRaises(ValueError) as cm:
+                fmt.to_days_bytes(data)
+            self.assertEqual("cannot parse date: " + message, str(cm.exception))
+
+class DaysTableTest(unittest.TestCase):
+
+    def test_every_entry(self):
+        table = days_table()
+        self.assertEqual(len(table), (MAX_YEAR - MIN_YEAR + 1) * 372)
+        for year in range(MIN_YEAR, MAX_YEAR+1):
+            for month in range(1, 13):
+                for day in range(1, 32):
+                    actual = table[(year-MIN_YEAR)*372 + (month-1)*31 + (day-1)]
+                    try:
+                        validate(day, month, year)
+                    except ValueError:
+                        self.assertEqual(actual, INVALID_DATE)
+                    else:
+                        self.assertEqual(actual, days_since_epoch(day, month, year))
+    def test_verify_exhaustive(self):
+        self.assertEqual(verify_exhaustive(), [])
+    def test_to_days(self):
+        days_table()
+        fmt = compile_format("DD/MM/YYYY")
+        self.assertEqual(fmt.to_days("29/02/2000"), days_since_epoch(29, 2, 2000))
+        for string, message in [("29/02/2100", "invalid day"), \
+                ("01/13/2000", "invalid month"), ("01/01/3000", "invalid year"), \
+                ("32/01/2000", "invalid day"), ("00/01/2000", "invalid day")]:
+            with self.assertRaises(ValueError) as cm:
+                fmt.to_days(string)
+            self.assertEqual("cannot parse date: " + message, str(cm.exception))
+
+class ParseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        enable_parse_cache(3)
+        self.addCleanup(disable_parse_cache)
+
+    def test_counters(self):
+        for string in ["01/01/2000", "02/01/2000", "01/01/2000", "03/01/2000", "04/01/2000"]:
+            self.assertEqual(compile_format("DD/MM/YYYY").to_days(string), \
+                    date(2000, 1, int(string[:2])).toordinal() - 1)
+        info = parse_cache_info()
+        self.assertEqual((info.hits, info.misses, info.evictions), (1, 4, 1))
+        self.assertEqual((info.maxsize, info.currsize), (3, 3))
+    def test_least_recently_used(self):
+        datediff("01/01/2000", "02/01/2000")
+        datediff("01/01/2000", "03/01/2000")
+        datediff("04/01/2000", "01/01/2000")
+        datediff("02/01/2000", "01/01/2000")
+        self.assertEqual(parse_cache_info().hits, 3)
+    def test_format_in_key(self):
+        self.assertEqual(datediff("01/02/2000", "01/01/2000"), 30)
+        self.assertEqual(datediff("01/02/2000", "01/01/2000", "MM/DD/YYYY"), 0)
+    def test_invalid_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                datediff("01/01/2000", "29/02/2100")
+        self.assertEqual(parse_cache_info().currsize, 1)
+    def test_clear_and_disable(self):
+        datediff("01/01/2000", "01/01/2000")
+        clear_parse_cache()
+        self.assertEqual(parse_cache_info(), (0, 0, 0, 3, 0))
+        disable_parse_cache()
+        datediff("01/01/2000", "01/01/2000")
+        self.assertEqual(parse_cache_info(), (0, 0, 0, 0, 0))
+        with self.assertRaises(ValueError):
+            enable_parse_cache(0)
+
+class FromDaysSinceEpochTest(unittest.TestCase):
+
+    def test_every_date(self):
+        first = date(MIN_YEAR, 1, 1).toordinal()
+        last = date(MAX_YEAR, 12, 31).toordinal()
+        for ordinal in range(first, last+1):
+            d = date.fromordinal(ordinal)
+            self.assertEqual(from_days_since_epoch(ordinal - 1), (d.day, d.month, d.year))
+    def test_many(self):
+        days = [0, 1154, 693960, date(2999, 12, 31).toordinal() - 1]
+        expected = [from_days_since_epoch(n) for n in days]
+        self.assertEqual(list(zip(*from_days_since_epoch_many(days))), expected)
+        if numpy is not None:
+            actual = from_days_since_epoch_many(numpy.array(days))
+            self.assertEqual(list(zip(*(a.tolist() for a in actual))), expected)
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_many_numpy_range(self):
+        first = date(MIN_YEAR, 1, 1).toordinal()
+        last = date(MAX_YEAR, 12, 31).toordinal()
+        day, month, year = from_days_since_epoch_many(numpy.arange(first - 1, last))
+        for i in range(0, last - first + 1, 97):
+            d = date.fromordinal(first + i)
+            self.assertEqual((day[i], month[i], year[i]), (d.day, d.month, d.year))
+    def test_add_days(self):
+        self.assertEqual(add_days("31/12/1999", 1), "01/01/2000")
+        self.assertEqual(add_days("01/03/2000", -1), "29/02/2000")
+        self.assertEqual(add_days("2000-01-01", 366, "YYYY-MM-DD"), "2001-01-01")
+        self.assertEqual(add_days("01/01/1901", 0), "01/01/1901")
+        with self.assertRaises(ValueError):
+            add_days("01/01/1901", -1)
+    def test_format(self):
+        self.assertEqual(compile_format("MM/DD/YYYY").format(3, 1, 1989), "01/03/1989")
+        self.assertEqual(compile_format("{YYYYMMDD}").format(3, 1, 1989), "{19890103}")
+        self.assertEqual(Date.parse("03/01/1989").format("YYYY-MM-DD"), "1989-01-03")
+
+class DateTest(unittest.TestCase):
+
+    def test_subtract(self):
+        for date1, date2 in [("02/06/1983", "22/06/1983"), ("03/01/1989", "03/08/1983"), \
+                ("03/08/2018", "04/08/2018"), ("01/01/2000", "01/01/2000")]:
+            self.assertEqual(Date.parse(date1) - Date.parse(date2), datediff(date1, date2))
+            self.assertEqual(Date.parse(date2) - Date.parse(date1), datediff(date1, date2))
+    def test_fields(self):
+        for d in [date(1901, 1, 1), date(2000, 2, 29), date(2100, 3, 1), date(2999, 12, 31)]:
+            actual = Date(d.toordinal() - 1)
+            self.assertEqual((actual.day, actual.month, actual.year), (d.day, d.month, d.year))
+            self.assertEqual(str(actual), d.strftime("%d/%m/%Y"))
+    def test_ordering(self):
+        dates = [Date.parse(s) for s in ["03/01/1989", "03/08/1983", "22/06/1983", "03/08/1983"]]
+        self.assertEqual([str(d) for d in sorted(dates)], \
+                ["22/06/1983", "03/08/1983", "03/08/1983", "03/01/1989"])
+        self.assertEqual(len(set(dates)), 3)
+        self.assertEqual({Date.parse("03/08/1983"): 1}[Date.parse("1983-08-03", "YYYY-MM-DD")], 1)
+        self.assertNotEqual(Date.parse("03/08/1983"), "03/08/1983")
+        self.assertFalse(hasattr(dates[0], "__dict__"))
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            Date(date(1900, 12, 31).toordinal() - 1)
+        with self.assertRaises(ValueError):
+            Date(date(3000, 1, 1).toordinal() - 1)
+        with self.assertRaises(ValueError):
+            Date.parse("29/02/2100")
+        for days in [726104.5, 726104.0, "726104"]:
+            with self.assertRaises(TypeError):
+                Date(days)
+
+class DateIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(0)
+        first = date(1990, 1, 1).toordinal()
+        self.dates = [date.fromordinal(first + rng.randrange(3000)) for _ in range(500)]
+        self.strings = [d.strftime("%d/%m/%Y") for d in self.dates]
+        self.index = DateIndex(self.strings)
+
+    def test_count_between(self):
+        for a, b in [("01/01/1991", "31/12/1991"), ("31/12/1995", "01/01/1990"), \
+                ("01/01/1980", "01/01/1985"), (self.strings[0], self.strings[0])]:
+            a, b = sorted([Date.parse(a), Date.parse(b)])
+            expected = sum(1 for s in self.strings if a <= Date.parse(s) <= b)
+            self.assertEqual(self.index.count_between(str(a), str(b)), expected)
+            self.assertEqual(self.index.count_between(b, a), expected)
+    def test_nearest(self):
+        for query in ["01/01/1980", "15/06/1992", "01/01/2010", self.strings[3]]:
+            expected = min(self.dates, key=lambda d: (abs(Date.parse(query).days - d.toordinal() + 1), d))
+            self.assertEqual(str(self.index.nearest(query)), expected.strftime("%d/%m/%Y"))
+        self.assertIsNone(DateIndex([]).nearest("01/01/2000"))
+    def test_within(self):
+        for query, whole_days in [("15/06/1992", 10), ("01/01/1990", 0), ("01/01/2010", 5)]:
+            expected = sorted(s for s in self.strings if datediff(s, query) <= whole_days)
+            actual = [str(d) for d in self.index.within(query, whole_days)]
+            self.assertEqual(sorted(actual), expected)
+        with self.assertRaises(ValueError):
+            self.index.within(self.strings[0], -1)
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy(self):
+        index = DateIndex(numpy.array(self.strings))
+        self.assertEqual(index.days, self.index.days)
+        self.assertEqual(len(index), 500)
+
+class BusinessDaysTest(unittest.TestCase):
+
+    @staticmethod
+    def expected(date1, date2, holidays=()):
+        date1, date2 = sorted([date1, date2])
+        days = [date1 + timedelta(days=i) for i in range(1, (date2 - date1).days)]
+        return sum(1 for d in days if d.weekday() < 5 and d not in holidays)
+
+    def test_weekday(self):
+        for d in [date(1901, 1, 1), date(1989, 1, 3), date(2999, 12, 31)]:
+            self.assertEqual(weekday(d.toordinal() - 1), d.weekday())
+    def test_random(self):
+        rng = random.Random(0)
+        first = date(1901, 1, 1).toordinal()
+        holidays = {date.fromordinal(first + rng.randrange(400000)) for _ in range(20000)}
+        calendar = HolidayCalendar([d.strftime("%d/%m/%Y") for d in holidays])
+        for _ in range(300):
+            date1 = date.fromordinal(first + rng.randrange(400000))
+            date2 = date1 + timedelta(days=rng.randrange(60))
+            s1, s2 = date1.strftime("%d/%m/%Y"), date2.strftime("%d/%m/%Y")
+            self.assertEqual(business_days_between(s1, s2), self.expected(date1, date2))
+            self.assertEqual(business_days_between(s2, s1, holidays=calendar), \
+                    self.expected(date1, date2, holidays))
+    def test_holiday_calendar_format(self):
+        holidays = HolidayCalendar(["2000-12-25", "2000-12-26", "2000-12-23"], "YYYY-MM-DD")
+        self.assertEqual(business_days_between("2000-12-22", "2000-12-29", "YYYY-MM-DD", holidays), 2)
+        with self.assertRaises(TypeError):
+            business_days_between("2000-12-22", "2000-12-29", "YYYY-MM-DD", ["2000-12-25"])
+    def test_range(self):
+        self.assertEqual(business_days_between("01/01/1901", "31/12/2999"), \
+                self.expected(date(1901, 1, 1), date(2999, 12, 31)))
+
+class DetectFormatTest(unittest.TestCase):
+
+    def test_unambiguous(self):
+        self.assertEqual(detect_format(["03/01/1989", "31/08/1983"]), "DD/MM/YYYY")
+        self.assertEqual(detect_format(["01/03/1989", "08/31/1983"]), "MM/DD/YYYY")
+        self.assertEqual(detect_format([b"1989-01-03\n", b"1983-08-31\n"]), "YYYY-MM-DD")
+    def test_separators(self):
+        self.assertEqual(detect_format(["13-01-1989"], ["DD/MM/YYYY", "DD-MM-YYYY"]), "DD-MM-YYYY")
+    def test_ambiguous(self):
+        with self.assertRaises(ValueError):
+            detect_format(["03/01/1989", "03/08/1983"])
+    def test_no_match(self):
+        for samples in [[], ["31/31/1989"], ["03/01/1989", "1983-08-03"], ["3/1/89"]]:
+            with self.assertRaises(ValueError):
+                detect_format(samples)
+
+class DateDiffManyTest(unittest.TestCase):
+
+    dates1 = ["02/06/1983", "04/07/1984", "03/01/1989", "03/08/2018", "01/01/2000"]
+    dates2 = ["22/06/1983", "25/12/1984", "03/08/1983", "04/08/2018", "01/01/2000"]
+
+    def test_sequences(self):
+        self.assertEqual(list(datediff_many(self.dates1, self.dates2)), \
+                [19, 173, 1979, 0, 0])
+    def test_matches_datediff(self):
+        expected = [datediff(a, b) for a, b in zip(self.dates1, self.dates2)]
+        self.assertEqual(list(datediff_many(self.dates2, self.dates1)), expected)
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError) as cm:
+            datediff_many(["29/02/2100"], ["01/01/2000"])
+        self.assertEqual("cannot parse date: invalid day", str(cm.exception))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_str(self):
+        actual = datediff_many(numpy.array(self.dates1), numpy.array(self.dates2))
+        self.assertEqual(actual.dtype, numpy.int32)
+        self.assertEqual(actual.tolist(), [19, 173, 1979, 0, 0])
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_bytes(self):
+        dates1 = numpy.array(["1989-01-03", "1992-02-29"], dtype="S")
+        dates2 = numpy.array(["1983-08-03", "1992-03-01"], dtype="S")
+        actual = datediff_many(dates1, dates2, "YYYY-MM-DD")
+        self.assertEqual(actual.tolist(), [1979, 0])
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_object(self):
+        actual = datediff_many(numpy.array(self.dates1, dtype=object), \
+                numpy.array([d.encode() for d in self.dates2], dtype=object))
+        self.assertEqual(actual.tolist(), [19, 173, 1979, 0, 0])
+        self.assertEqual(len(datediff_many(numpy.array([], dtype=object), \
+                numpy.array([], dtype=object))), 0)
+        with self.assertRaises(TypeError):
+            datediff_many(numpy.array([None], dtype=object), numpy.array(["01/01/2000"]))
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_fallback(self):
+        # elements int() accepts but that are not plain digits
+        actual = datediff_many(numpy.array([" 2/06/1983", "+3/01/1989"]), \
+                numpy.array(["22/06/1983", "03/08/1983"]))
+        self.assertEqual(actual.tolist(), [19, 1979])
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_invalid(self):
+        for date, message in [("29/02/2100", "invalid day"), \
+                ("01/13/2000", "invalid month"), ("01/01/3000", "invalid year")]:
+            with self.assertRaises(ValueError) as cm:
+                datediff_many(numpy.array(["01/01/2000", date]), \
+                        numpy.array(["01/01/2000", "01/01/2000"]))
+            self.assertEqual("cannot parse date: " + message, str(cm.exception))
+        with self.assertRaises(ValueError):
+            datediff_many(numpy.array(["01/Jan/2100"]), numpy.array(["01/01/2000"]))
+
+class DateDiffManyStatusTest(unittest.TestCase):
+
+    dates1 = ["02/06/1983", "29/02/2100", "01/13/2000", "01/01/3000", "01/Jan/2000", \
+            "01/01/2000", "1/1/2000", "", "03/01/1989"]
+    dates2 = ["22/06/1983", "01/01/2000", "01/01/2000", "01/01/2000", "01/01/2000", \
+            "31/04/2000", "01/01/2000", "01/01/2000", "03/08/1983"]
+    expected = ([19, 0, 0, 0, 0, 0, 0, 0, 1979], [STATUS_OK, STATUS_INVALID_DAY, \
+            STATUS_INVALID_MONTH, STATUS_INVALID_YEAR, STATUS_UNPARSEABLE, \
+            STATUS_INVALID_DAY, STATUS_UNPARSEABLE, STATUS_UNPARSEABLE, STATUS_OK])
+
+    def test_sequences(self):
+        days, status = datediff_many_status(self.dates1, self.dates2)
+        self.assertEqual((list(days), list(status)), self.expected)
+    def test_bytes(self):
+        days, status = datediff_many_status([d.encode() for d in self.dates1], \
+                [d.encode() for d in self.dates2])
+        self.assertEqual((list(days), list(status)), self.expected)
+    def test_matches_datediff(self):
+        days, status = datediff_many_status(self.dates1, self.dates2)
+        for date1, date2, d, s in zip(self.dates1, self.dates2, days, status):
+            if s == STATUS_OK:
+                self.assertEqual(d, datediff(date1, date2))
+            else:
+                self.assertRaises(ValueError, datediff, date1, date2)
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy(self):
+        for dtype in ["U", "S"]:
+            days, status = datediff_many_status(numpy.array(self.dates1, dtype=dtype), \
+                    numpy.array(self.dates2, dtype=dtype))
+            self.assertEqual(status.dtype, numpy.uint8)
+            self.assertEqual((days.tolist(), status.tolist()), self.expected)
+    def test_non_ascii_digits(self):
+        # Arabic-Indic digits are decimal, but only ASCII digits are accepted.
+        dates1 = ["\u0660\u0663/\u0660\u0661/\u0661\u0669\u0668\u0669"]
+        days, status = datediff_many_status(dates1, ["03/08/1983"])
+        self.assertEqual(list(status), [STATUS_UNPARSEABLE])
+        if numpy is not None:
+            days, status = datediff_many_status(numpy.array(dates1), numpy.array(["03/08/1983"]))
+            self.assertEqual(status.tolist(), [STATUS_UNPARSEABLE])
+
+class ValidateLinesTest(unittest.TestCase):
+
+    lines = ["1,03/01/1989,03/08/1983\n", "2,29/02/2100,01/01/2000\n", "3,01/13/2000,01/01/3000\n", \
+            "4,01/Jan/2000,01/01/2000\n", "5\n"]
+
+    def test_counts(self):
+        quarantine = io.StringIO()
+        counts = validate_lines([line.split(",", 1)[-1] for line in self.lines], \
+                delimiter=",", quarantine=quarantine)
+        self.assertEqual(counts, [4, 1, 1, 1, 2])
+        self.assertEqual(quarantine.getvalue(), "2\n3\n4\n5\n")
+    def test_column(self):
+        quarantine = io.StringIO()
+        counts = validate_lines([line.encode() for line in self.lines], \
+                delimiter=b",", column=2, quarantine=quarantine)
+        self.assertEqual(counts, [3, 0, 0, 1, 1])
+        self.assertEqual(quarantine.getvalue(), "3\n5\n")
+    def test_negative_column(self):
+        lines = [line.encode() for line in self.lines]
+        self.assertEqual(validate_lines(lines, delimiter=b",", column=-1), \
+                validate_lines(lines, delimiter=b",", column=2))
+        self.assertEqual(validate_lines(["01/01/2000\n"], column=-1), [1, 0, 0, 0, 0])
+    def test_name(self):
+        quarantine = io.StringIO()
+        validate_lines(self.lines[3:], delimiter=",", quarantine=quarantine, name="b.csv")
+        self.assertEqual(quarantine.getvalue(), "b.csv:1\nb.csv:2\n")
+    def test_one_date_per_line(self):
+        self.assertEqual(validate_lines(["1989-01-03\n", "\n", "1989-02-30\n"], "YYYY-MM-DD"), \
+                [1, 1, 0, 0, 1])
+
+class DateDiffFromTest(unittest.TestCase):
+
+    dates = ["22/06/1983", "03/01/1989", "04/08/1983", "03/08/1983", "01/01/1901", "31/12/2999"]
+
+    def test_sequences(self):
+        expected = [datediff("03/08/1983", d) for d in self.dates]
+        self.assertEqual(list(datediff_from("03/08/1983", self.dates)), expected)
+        self.assertEqual(list(datediff_from("03/08/1983", iter(self.dates))), expected)
+        self.assertEqual(list(datediff_from("03/08/1983", (d.encode() for d in self.dates))), expected)
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError) as cm:
+            datediff_from("03/08/1983", ["22/06/1983", "29/02/2100"])
+        self.assertEqual("line 2: cannot parse date: invalid day", str(cm.exception))
+        with self.assertRaises(ValueError):
+            datediff_from("29/02/2100", self.dates)
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy(self):
+        expected = [datediff("03/08/1983", d) for d in self.dates]
+        actual = datediff_from("03/08/1983", numpy.array(self.dates))
+        self.assertEqual(actual.dtype, numpy.int32)
+        self.assertEqual(actual.tolist(), expected)
+
+class DateDiffMatrixTest(unittest.TestCase):
+
+    dates = ["02/06/1983", "22/06/1983", "03/01/1989", "03/08/1983", "04/08/1983", "02/06/1983"]
+
+    def expected(self):
+        return [[datediff(a, b) for b in self.dates] for a in self.dates]
+
+    def test_matrix(self):
+        self.assertEqual([list(row) for row in datediff_matrix(self.dates)], self.expected())
+    def test_condensed(self):
+        expected = [row[j] for i, row in enumerate(self.expected()) for j in range(i+1, len(row))]
+        self.assertEqual(list(datediff_matrix(self.dates, condensed=True)), expected)
+        self.assertEqual(list(datediff_matrix(self.dates[:1], condensed=True)), [])
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy(self):
+        actual = datediff_matrix(numpy.array(self.dates))
+        self.assertEqual(actual.dtype, numpy.int32)
+        self.assertEqual(actual.tolist(), self.expected())
+        expected = [row[j] for i, row in enumerate(self.expected()) for j in range(i+1, len(row))]
+        self.assertEqual(datediff_matrix(numpy.array(self.dates), condensed=True).tolist(), expected)
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            datediff_matrix(self.dates + ["29/02/2100"])
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class Datetime64Test(unittest.TestCase):
+
+    dates1 = ["1983-06-02", "1989-01-03", "2018-08-03", "1901-01-01"]
+    dates2 = ["1983-06-22", "1983-08-03", "2018-08-04", "2999-12-31"]
+
+    def test_converters(self):
+        values = numpy.array(self.dates1 + self.dates2, dtype="datetime64[D]")
+        days = datetime64_to_days(values)
+        self.assertEqual(days.tolist(), [compile_format("YYYY-MM-DD").to_days(d) \
+                for d in self.dates1 + self.dates2])
+        self.assertTrue((days_to_datetime64(days) == values).all())
+        seconds = numpy.array(["1989-01-03T23:59:59"], dtype="datetime64[s]")
+        self.assertEqual(datetime64_to_days(seconds).tolist(), [days[1]])
+    def test_converter_invalid(self):
+        for value in ["NaT", "1900-12-31", "3000-01-01"]:
+            with self.assertRaises(ValueError):
+                datetime64_to_days(numpy.array(["2000-01-01", value], dtype="datetime64[D]"))
+    def test_datediff_many(self):
+        expected = [datediff(a, b, "YYYY-MM-DD") for a, b in zip(self.dates1, self.dates2)]
+        actual = datediff_many(numpy.array(self.dates1, dtype="datetime64[D]"), \
+                numpy.array(self.dates2, dtype="datetime64[D]"))
+        self.assertEqual(actual.tolist(), expected)
+        actual = datediff_many(numpy.array(self.dates1, dtype="datetime64[D]"), \
+                numpy.array(self.dates2), "YYYY-MM-DD")
+        self.assertEqual(actual.tolist(), expected)
+    def test_invalid(self):
+        for value in ["1900-12-31", "3000-01-01", "NaT"]:
+            with self.assertRaises(ValueError):
+                datediff_many(numpy.array([value], dtype="datetime64[D]"), \
+                        numpy.array(["2000-01-01"], dtype="datetime64[D]"))
+        days, status = datediff_many_status(numpy.array(["NaT", "3000-01-01", "2000-01-03"], \
+                dtype="datetime64[D]"), numpy.array(["2000-01-01"] * 3, dtype="datetime64[D]"))
+        self.assertEqual(status.tolist(), [STATUS_UNPARSEABLE, STATUS_INVALID_YEAR, STATUS_OK])
+        self.assertEqual(days.tolist(), [0, 0, 1])
+
+class DayNumberTest(unittest.TestCase):
+
+    # Day numbers of 01/01/1901, 03/01/1989 and 31/12/2999 in each system.
+    day_numbers = {
+        "unix": [-25202, 6942, 376199],
+        "unix_seconds": [-2177452800, 599788800, 32503593600],
+        "excel": [367, 32511, 401768],
+        "julian": [2415386, 2447530, 2816787],
+    }
+    days = [days_since_epoch(1, 1, 1901), days_since_epoch(3, 1, 1989), \
+            days_since_epoch(31, 12, 2999)]
+
+    def test_round_trip(self):
+        for system, values in self.day_numbers.items():
+            self.assertEqual([from_day_number(v, system) for v in values], self.days)
+            self.assertEqual([to_day_number(d, system) for d in self.days], values)
+            self.assertEqual(list(from_day_number_many(values, system)), self.days)
+            self.assertEqual(list(to_day_number_many(self.days, system)), values)
+    def test_fractions(self):
+        self.assertEqual(from_day_number(599788800 + 86399, "unix_seconds"), self.days[1])
+        self.assertEqual(from_day_number(-2177452800 + 0.5, "unix_seconds"), self.days[0])
+        self.assertEqual(from_day_number(32511.99, "excel"), self.days[1])
+        # Julian days start at noon, so 2447529.5 is midnight starting 03/01/1989.
+        for value, days in [(2447529.49, self.days[1] - 1), (2447529.5, self.days[1]), \
+                (2447529.75, self.days[1]), (2447530.49, self.days[1])]:
+            self.assertEqual(from_day_number(value, "julian"), days)
+            self.assertEqual(list(from_day_number_many([value], "julian")), [days])
+    def test_invalid(self):
+        for system, values in self.day_numbers.items():
+            for value in [values[0] - 1, values[2] + 1] if system != "unix_seconds" \
+                    else [values[0] - 1, values[2] + 86400]:
+                with self.assertRaises(ValueError):
+                    from_day_number(value, system)
+                with self.assertRaises(ValueError):
+                    from_day_number_many([value], system)
+            with self.assertRaises(ValueError):
+                to_day_number(self.days[2] + 1, system)
+        with self.assertRaises(ValueError):
+            from_day_number(0, "lotus")
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy(self):
+        for system, values in self.day_numbers.items():
+            actual = from_day_number_many(numpy.array(values), system)
+            self.assertEqual(actual.dtype, numpy.int32)
+            self.assertEqual(actual.tolist(), self.days)
+            self.assertEqual(to_day_number_many(actual, system).tolist(), values)
+        self.assertEqual(from_day_number_many(numpy.array([32511.5]), "excel").tolist(), \
+                [self.days[1]])
+        self.assertEqual(from_day_number_many(numpy.array([2447529.25, 2447529.75]), \
+                "julian").tolist(), [self.days[1] - 1, self.days[1]])
+        with self.assertRaises(ValueError):
+            from_day_number_many(numpy.array([2415385]), "julian")
+        with self.assertRaises(ValueError):
+            to_day_number_many(numpy.array([self.days[2] + 1]), "unix")
+
+class DateDiffLinesTest(unittest.TestCase):
+
+    def test_whitespace(self):
+        lines = ["02/06/1983 22/06/1983\n", "03/01/1989\t03/08/1983\n", "03/08/2018  04/08/2018"]
+        self.assertEqual(list(datediff_lines(lines)), [19, 1979, 0])
+    def test_delimiter(self):
+        lines = ["1989-01-03;1983-08-03\r\n", "2000-01-01;2000-01-03\n"]
+        self.assertEqual(list(datediff_lines(lines, "YYYY-MM-DD", ";")), [1979, 1])
+    def test_bytes(self):
+        lines = [b"1989-01-03;1983-08-03\r\n", b"2000-01-01;2000-01-03\n"]
+        self.assertEqual(list(datediff_lines(lines, "YYYY-MM-DD", b";")), [1979, 1])
+    def test_invalid_line(self):
+        with self.assertRaises(ValueError) as cm:
+            list(datediff_lines(["01/01/2000 03/01/2000", "29/02/2100 01/01/2000"]))
+        self.assertEqual("line 2: cannot parse date: invalid day", str(cm.exception))
+        with self.assertRaises(ValueError) as cm:
+            list(datediff_lines(["01/01/2000 03/01/2000 04/01/2000"]))
+        self.assertEqual("line 1: expected 2 dates, found 3", str(cm.exception))
+
+class DateDiffCsvTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "dates.csv")
+
+    def _datediff_csv(self, text, *args, **kwargs):
+        with open(self.path, "w", newline="") as f:
+            f.write(text)
+        out = io.StringIO()
+        datediff_csv(self.path, out, *args, **kwargs)
+        return out.getvalue()
+
+    def test_named_columns(self):
+        text = "id,start,end\n1,02/06/1983,22/06/1983\n2,\"03/01/1989\",03/08/1983\n"
+        self.assertEqual(self._datediff_csv(text, "start", "end"), \
+                "id,start,end,datediff\n1,02/06/1983,22/06/1983,19\n2,03/01/1989,03/08/1983,1979\n")
+    def test_byte_order_mark(self):
+        text = "\ufeffid,start,end\n1,02/06/1983,22/06/1983\n"
+        self.assertEqual(self._datediff_csv(text, "start", "end"), \
+                "id,start,end,datediff\n1,02/06/1983,22/06/1983,19\n")
+        self.assertEqual(self._datediff_csv("\ufeff02/06/1983,22/06/1983\n", 0, 1, header=False), \
+                "02/06/1983,22/06/1983,19\n")
+    def test_empty(self):
+        self.assertEqual(self._datediff_csv("", "start", "end"), "")
+        self.assertEqual(self._datediff_csv("\ufeff", 0, 1, header=False), "")
+    def test_no_header(self):
+        text = "1989-01-03,1983-08-03\n"
+        self.assertEqual(self._datediff_csv(text, 0, 1, "YYYY-MM-DD", header=False), \
+                "1989-01-03,1983-08-03,1979\n")
+    def test_parallel_chunks(self):
+        rows = ["{},{},01/01/2000".format(i, (date(2000, 1, 1) + timedelta(days=i)).strftime("%d/%m/%Y")) \
+                for i in range(1000)]
+        expected = "".join("{},{}\n".format(row, max(i - 1, 0)) for i, row in enumerate(rows))
+        text = "".join(row + "\n" for row in rows)
+        self.assertEqual(self._datediff_csv(text, 1, 2, header=False, jobs=2, chunk_size=1000), expected)
+        self.assertEqual(self._datediff_csv(text, 1, 2, header=False, jobs=1, chunk_size=1000), expected)
+    def test_parse_cache_in_workers(self):
+        # A spawned worker starts without the parse cache of the parent.
+        with open(self.path, "w") as f:
+            f.write("02/06/1983,22/06/1983\n")
+        self.addCleanup(disable_parse_cache)
+        disable_parse_cache()
+        task = (self.path, 0, os.path.getsize(self.path), 0, 1, "DD/MM/YYYY", 16)
+        self.assertEqual(datediff_module._datediff_csv_chunk(task), \
+                ("02/06/1983,22/06/1983,19\n", 1))
+        self.assertEqual(parse_cache_info().maxsize, 16)
+    def test_bounded_submission(self):
+        submitted = []
+        def tasks():
+            for i in range(100):
+                submitted.append(i)
+                yield i
+        with multiprocessing.Pool(2) as pool:
+            results = datediff_module._imap_bounded(pool, abs, tasks(), 4)
+            self.assertEqual(next(results), 0)
+            self.assertLessEqual(len(submitted), 5)
+            self.assertEqual(list(results), list(range(1, 100)))
+    def test_invalid_row(self):
+        text = "start,end\n" + "01/01/2000,03/01/2000\n" * 100 + "29/02/2100,01/01/2000\n"
+        with self.assertRaises(ValueError) as cm:
+            self._datediff_csv(text, "start", "end", jobs=2, chunk_size=100)
+        self.assertEqual("line 102: cannot parse date: invalid day", str(cm.exception))
+        with self.assertRaises(ValueError) as cm:
+            self._datediff_csv(text, "start", "finish")
+        self.assertEqual("no column named 'finish'", str(cm.exception))
+
+class SuccessiveDiffsTest(unittest.TestCase):
+
+    def test_gaps(self):
+        dates = ["02/06/1983", "22/06/1983", "23/06/1983", "23/06/1983", "03/08/1983", "03/01/1989"]
+        expected = [datediff(a, b) for a, b in zip(dates, dates[1:])]
+        self.assertEqual(list(successive_diffs(dates)), expected)
+        self.assertEqual(list(successive_diffs(d.encode() + b"\n" for d in dates)), expected)
+    def test_short(self):
+        self.assertEqual(list(successive_diffs([])), [])
+        self.assertEqual(list(successive_diffs(["02/06/1983"])), [])
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError) as cm:
+            list(successive_diffs(["02/06/1983", "29/02/2100"]))
+        self.assertEqual("line 2: cannot parse date: invalid day", str(cm.exception))
+
+class DateDiffFixedWidthTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "records.dat")
+
+    def _datediff_fixed_width(self, data, *args, **kwargs):
+        with open(self.path, "wb") as f:
+            f.write(data)
+        return list(datediff_fixed_width(self.path, *args, **kwargs))
+
+    def test_lines(self):
+        data = b"A 02/06/1983 22/06/1983\nB 03/01/1989 03/08/1983\n"
+        self.assertEqual(self._datediff_fixed_width(data, 2, 13), [19, 1979])
+        self.assertEqual(self._datediff_fixed_width(data.rstrip(), 2, 13), [19, 1979])
+    def test_record_length(self):
+        data = b"A19830602198306220B19890103198308030"
+        self.assertEqual(self._datediff_fixed_width(data, 1, 9, "YYYYMMDD", 18), [19, 1979])
+    def test_empty(self):
+        self.assertEqual(self._datediff_fixed_width(b"", 0, 10), [])
+    def test_invalid_record(self):
+        with self.assertRaises(ValueError) as cm:
+            self._datediff_fixed_width(b"02/06/1983 22/06/1983\n29/02/2100 01/01/2000\n", 0, 11)
+        self.assertEqual("record 2: cannot parse date: invalid day", str(cm.exception))
+        with self.assertRaises(ValueError) as cm:
+            self._datediff_fixed_width(b"02/06/1983 22/06/1983\n02/06/1983\n", 0, 11)
+        self.assertEqual("record 2: expected at least 21 bytes, found 10", str(cm.exception))
+
+class ServerTest(unittest.TestCase):
+
+    def _test_server(self, address):
+        server = make_server(address)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            self.assertEqual(query(address, "02/06/1983", "22/06/1983"), 19)
+            self.assertEqual(query(address, "1989-01-03", "1983-08-03", "YYYY-MM-DD"), 1979)
+            with self.assertRaises(ValueError) as cm:
+                query(address, "29/02/2100", "01/01/2000")
+            self.assertEqual("cannot parse date: invalid day", str(cm.exception))
+            with self.assertRaises(ValueError):
+                query(address, "\xe91/01/2000", "01/01/2000")
+            self.assertEqual(query(address, "02/06/1983", "22/06/1983"), 19)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix domain sockets are unavailable")
+    def test_unix(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self._test_server(os.path.join(directory, "datediff.sock"))
+    def test_tcp(self):
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            port = sock.getsockname()[1]
+        self._test_server("localhost:{}".format(port))
+    def test_non_ascii_request(self):
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            port = sock.getsockname()[1]
+        server = make_server("localhost:{}".format(port))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            with socket.create_connection(("localhost", port)) as sock, \
+                    sock.makefile("rwb") as f:
+                f.write("\xe91/01/2000 01/01/2000\n02/06/1983 22/06/1983\n".encode("utf-8"))
+                f.flush()
+                self.assertTrue(f.readline().startswith(b"error: "))
+                self.assertEqual(f.readline(), b"19\n")
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+class ScriptTest(unittest.TestCase):
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datediff.py")
+
+    def test_doctests(self):
+        failures, _ = doctest.testmod(datediff_module)
+        self.assertEqual(failures, 0)
+    def test_self_test(self):
+        result = subprocess.run([sys.executable, self.script, "--self-test"], \
+                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, msg=result.stdout)
+    def _run(self, *args, input=None):
+        return subprocess.run([sys.executable, self.script] + list(args), \
+                input=input, capture_output=True, text=True)
+
+    def test_serve_date_fmt(self):
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            address = "localhost:{}".format(sock.getsockname()[1])
+        server = subprocess.Popen([sys.executable, self.script, "--serve", address, \
+                "--date-fmt", "YYYY-MM-DD"])
+        try:
+            for _ in range(100):
+                try:
+                    query(address, "2000-01-01", "2000-01-05")
+                    break
+                except OSError:
+                    time.sleep(0.05)
+            result = self._run("--connect", address, "2000-01-01", "2000-01-05")
+            self.assertEqual(result.stdout, "3\n", msg=result.stderr)
+            result = self._run("--connect", address, "01/01/2000", "05/01/2000", \
+                    "--date-fmt", "DD/MM/YYYY")
+            self.assertEqual(result.stdout, "3\n", msg=result.stderr)
+        finally:
+            server.terminate()
+            self.assertEqual(server.wait(), 0)
+    def test_validate_only_negative_column(self):
+        result = self._run("--validate-only", "--delimiter", ",", "--column", "-1", \
+                input="1,01/01/2000\n2,03/01/2000\n")
+        self.assertEqual(result.returncode, 0, msg=result.stdout)
+        self.assertIn("ok: 2\n", result.stdout)
+    def test_successive_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            names = []
+            for name, text in [("a.txt", "01/01/2000\n03/01/2000\n"), \
+                    ("b.txt", "01/06/2000\n05/06/2000\n"), ("c.txt", "xx\n")]:
+                names.append(os.path.join(directory, name))
+                with open(names[-1], "w") as f:
+                    f.write(text)
+            result = self._run("--successive", *names[:2])
+            self.assertEqual(result.stdout, "1\n3\n", msg=result.stderr)
+            result = self._run("--successive", *names)
+            self.assertEqual(result.returncode, 1)
+            self.assertIn("error: {}: line 1: ".format(names[2]), result.stderr)
+            result = self._run("--successive", input="01/01/2000\nxx\n")
+            self.assertEqual(result.stdout, "")
+            self.assertIn("error: line 2: ", result.stderr)
+    def test_reference(self):
+        with tempfile.TemporaryDirectory() as directory:
+            names = []
+            for name, text in [("a.txt", "01/01/2000\n05/01/2000\n"), ("b.txt", "11/01/2000\n")]:
+                names.append(os.path.join(directory, name))
+                with open(names[-1], "w") as f:
+                    f.write(text)
+            result = self._run("--reference", "01/01/2000", *names)
+            self.assertEqual(result.stdout, "0\n3\n9\n", msg=result.stderr)
+            result = self._run("--reference", "01/01/2000", names[1], "-", input="03/01/2000\n")
+            self.assertEqual(result.stdout, "9\n1\n", msg=result.stderr)
+        result = self._run("--reference", "2000-01-01", "--date-fmt", "auto", \
+                input="2000-01-03\n")
+        self.assertEqual(result.stdout, "1\n", msg=result.stderr)
+        result = self._run("--reference", "01/01/2000", input="01/01/2000\nxx\n")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("error: line 2: ", result.stderr)
+    def test_csv(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dates.csv")
+            with open(path, "w") as f:
+                f.write("id,start,end\n1,02/06/1983,22/06/1983\n")
+            result = self._run("--csv", path, "--columns", "start", "end", "--jobs", "1")
+            self.assertEqual(result.stdout, "id,start,end,datediff\n1,02/06/1983,22/06/1983,19\n", \
+                    msg=result.stderr)
+    def test_fixed_width(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "dates.dat")
+            with open(path, "w") as f:
+                f.write("A02/06/198322/06/1983\nB03/01/198903/08/1983\n")
+            result = self._run("--fixed-width", path, "--offsets", "1", "11")
+            self.assertEqual(result.stdout, "19\n1979\n", msg=result.stderr)
+    def test_dash_reads_pairs(self):
+        result = subprocess.run([sys.executable, self.script, "-"], \
+                input="01/01/2000 03/01/2000\n02/06/1983 22/06/1983\n", \
+                capture_output=True, text=True)
+        self.assertEqual(result.stdout, "1\n19\n")
+    def test_validate_only_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            names = []
+            for name, text in [("a.txt", "01/01/2000\n29/02/2100\n"), ("b.txt", "01/13/2000\n")]:
+                names.append(os.path.join(directory, name))
+                with open(names[-1], "w") as f:
+                    f.write(text)
+            quarantine = os.path.join(directory, "bad.txt")
+            result = subprocess.run([sys.executable, self.script, "--validate-only"] + names + \
+                    ["--quarantine", quarantine], capture_output=True, text=True)
+            self.assertEqual(result.returncode, 1)
+            self.assertIn("ok: 1\ninvalid day: 1\ninvalid month: 1\n", result.stdout)
+            with open(quarantine) as f:
+                self.assertEqual(f.read(), "{}:2\n{}:1\n".format(*names))
+    def test_startup_imports(self):
+        """A one-off invocation should only import what it needs. This runs the
+        script under -X importtime and checks that neither the doctest machinery
+        nor optional dependencies are loaded.
+        """
+        result = subprocess.run([sys.executable, "-X", "importtime", self.script, \
+                "01/01/2000", "03/01/2000"], capture_output=True, text=True)
+        self.assertEqual(result.stdout, "1\n")
+        imported = {line.rsplit("|", 1)[-1].strip() for line in \
+                result.stderr.splitlines() if line.startswith("import time:")}
+        for module in ["doctest", "pdb", "difflib", "numpy"]:
+            self.assertNotIn(module, imported)
+
 if __name__ == "__main__":
     random.seed(0)
     unittest.main()